@@ -0,0 +1,84 @@
+import contextlib
+import json
+import os
+import shutil
+import tempfile
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import pygame
+
+
+WINDOW_SIZE = 1280, 720
+
+# Just enough appdata for the app to start: pygame's own font and no other resources
+_FILES = {
+    'setgame.json': {name: name for name in ('info', 'config', 'fonts', 'images', 'sounds', 'music')},
+    'info/fonts.json': {'main': pygame.font.get_default_font()},
+    'info/images.json': {},
+    'info/sounds.json': {},
+    'info/music.json': {},
+    'config/resources.json': {},
+    'config/controls.json': {'default': {}},
+    'config/options.json': {'default': {'default': {
+        'size': list(WINDOW_SIZE),
+        'title': 'Set',
+        'font-size': 24,
+        'key-repeat-delay': '0.500',
+        'key-repeat-rate': '0.050',
+        'long-hover-delay': '1.000',
+        'multiple-click-delay': '0.300',
+        'cursor-blink-rate': '0.500',
+    }}},
+    'config/style.json': {'default': {'default': {
+        'font': '$font=main',
+        'fg-color': [0, 0, 0],
+        'bg-color': [200, 200, 200],
+        'highlight-bg-color': [100, 100, 255],
+    }}},
+}
+
+
+@contextlib.contextmanager
+def appdata():
+    # A temporary directory with an appdata directory in it, for running the game from
+    with tempfile.TemporaryDirectory() as root:
+        for name, data in _FILES.items():
+            path = os.path.join(root, 'appdata', *name.split('/'))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w') as f:
+                json.dump(data, f)
+        os.makedirs(os.path.join(root, 'appdata', 'fonts'))
+        shutil.copy(os.path.join(os.path.dirname(pygame.__file__), pygame.font.get_default_font()),
+                    os.path.join(root, 'appdata', 'fonts'))
+        yield root
+
+
+def spawn_app(root):
+    import hgf
+    from setgame import style
+    from setgame.app import SetgameApp
+
+    pygame.init()
+    manager = hgf.AppManager('setgame', SetgameApp)
+    manager.style_packs = style.style_packs
+    manager.compose_style = style.compose
+    manager.directory.root = os.path.join(root, 'appdata')
+    manager.load()
+    return manager.spawn_app()
+
+
+def step(app, frames=1, elapsed=16):
+    for _ in range(frames):
+        app._recursive_step(elapsed)
+
+
+def enter_sp_game(app):
+    # Log in and pick Single Player, as a player would
+    step(app)
+    app.login_screen.send_message('next')
+    step(app)
+    app.main_menu.send_message('sp')
+    step(app, 2)
+    return app.sp_game.game
@@ -0,0 +1,34 @@
+import timeit
+
+from setgame import batch, model
+
+
+BOARD_SIZES = 12, 15, 18, 21
+
+
+def run(count=100000, repeat=3, seed=0):
+    results = {}
+    for size in BOARD_SIZES:
+        boards = batch.random_boards(count, size, seed=seed)
+        scalar = boards[:count // 100].tolist()
+        results[size] = {
+            'model.count_sets': min(timeit.repeat(lambda: [model.count_sets(board) for board in scalar],
+                                                  number=1, repeat=repeat)) / len(scalar),
+            'batch.count_sets': min(timeit.repeat(lambda: batch.count_sets(boards),
+                                                  number=1, repeat=repeat)) / count,
+            'batch.all_sets': min(timeit.repeat(lambda: batch.all_sets(boards),
+                                                number=1, repeat=repeat)) / count,
+        }
+    return results
+
+
+def main():
+    results = run()
+    names = list(results[BOARD_SIZES[0]])
+    print('{:>5}  '.format('cards') + '  '.join('{:>16}'.format(name) for name in names))
+    for size, timings in results.items():
+        print('{:>5}  '.format(size) + '  '.join('{:>14.2f}us'.format(timings[name] * 1e6) for name in names))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,19 @@
+import time
+
+from setgame import engine
+
+
+def run(games=2000, seed=0):
+    start = time.perf_counter()
+    for i in range(games):
+        engine.simulate(seed + i)
+    elapsed = time.perf_counter() - start
+    return {'games_per_minute': games / elapsed * 60}
+
+
+def main():
+    print('{:.0f} games/minute'.format(run()['games_per_minute']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+import contextlib
+import io
+import itertools
+import time
+
+from setgame import model
+from ._app import appdata, enter_sp_game, spawn_app, step
+
+
+def _first_set(game):
+    return [game.play_deck.get_card(code) for code in min(sorted(found) for found in game.engine.deck.sets)]
+
+
+def _first_non_set(game):
+    return next(cards for cards in itertools.combinations(game.play_deck.play_deck, 3) if not model.is_set(cards))
+
+
+def _select(cards):
+    # Times the last click, which sends the selection up to SPGame and claims it
+    for card in cards[:-1]:
+        card.toggle_select()
+    start = time.perf_counter()
+    cards[-1].toggle_select()
+    return time.perf_counter() - start
+
+
+def _play(app, game, seed):
+    game.restart(seed)
+    step(app)
+    claims, wrong_claims, frames = [], [], 0
+    while game.game_state == game.STATE_STARTED:
+        wrong_claims.append(_select(_first_non_set(game)))
+        step(app)
+        claims.append(_select(_first_set(game)))
+        step(app, 3)
+        frames += 4
+    return claims, wrong_claims, frames
+
+
+def run(games=5, seed=0):
+    with appdata() as root:
+        app = spawn_app(root)
+        game = enter_sp_game(app)
+        with contextlib.redirect_stdout(io.StringIO()):
+            _play(app, game, seed)
+
+        claims, wrong_claims, frames = [], [], 0
+        start = time.perf_counter()
+        # Players print a summary at the end of each game
+        with contextlib.redirect_stdout(io.StringIO()):
+            for i in range(games):
+                game_claims, game_wrong_claims, game_frames = _play(app, game, seed + i)
+                claims += game_claims
+                wrong_claims += game_wrong_claims
+                frames += game_frames
+        elapsed = time.perf_counter() - start
+    return {
+        'game': elapsed / games,
+        'frame': elapsed / frames,
+        'claim': sum(claims) / len(claims),
+        'wrong claim': sum(wrong_claims) / len(wrong_claims),
+    }
+
+
+def main():
+    results = run()
+    print('SPGame from start to end, a wrong and a right claim per turn')
+    print('    {:<12} {:>10.1f}ms'.format('game', results['game'] * 1e3))
+    print('    {:<12} {:>10.2f}ms'.format('frame', results['frame'] * 1e3))
+    print('    {:<12} {:>10.1f}us'.format('claim', results['claim'] * 1e6))
+    print('    {:<12} {:>10.1f}us'.format('wrong claim', results['wrong claim'] * 1e6))
+
+
+if __name__ == '__main__':
+    main()
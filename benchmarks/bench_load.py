@@ -0,0 +1,289 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import re
+import signal
+import subprocess
+import sys
+import time
+
+from setgame import engine
+from setgame.client import Client
+from setgame.model import STANDARD
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Defaults for a full load test; run() uses a smaller one so the suite stays quick
+BOTS = 2000
+ROOMS = 500
+DURATION = 30
+RAMP = 5
+THINK = 3.0
+MISTAKES = 0.05
+SESSION = 20.0
+SEED = 0
+
+
+class LoadStats:
+    def __init__(self):
+        self.latencies = []
+        self.claims = 0
+        self.stale = 0
+        self.wrong = 0
+        self.sent = 0
+        self.received = 0
+        self.joins = 0
+        self.games = 0
+        self.connect_errors = 0
+
+
+class Bot:
+    # A player that takes think seconds or so (log-normally spread) to spot a set after the board changes, now
+    # and then claims three cards that aren't one, and moves to another room after about session seconds. It
+    # follows the room's game by replaying claims, like the desktop client, and finds sets with the model.
+    def __init__(self, index, rng, stats, rooms, think, mistakes, session):
+        self.name = 'bot {}'.format(index)
+        self.rng = rng
+        self.stats = stats
+        self.rooms = rooms
+        self.think = think
+        self.mistakes = mistakes
+        self.session = session
+        self.client = None
+        self.player = None
+        self.game = None
+        # (cards, time sent) of the claim waiting for an answer
+        self._claim = None
+
+    def _think_time(self):
+        return self.rng.lognormvariate(0, 0.5) * self.think
+
+    def send(self, request, *args):
+        self.stats.sent += 1
+        request(*args)
+
+    async def run(self, host, port, stop):
+        try:
+            self.client = await Client.connect(host, port)
+        except (OSError, asyncio.TimeoutError):
+            self.stats.connect_errors += 1
+            return
+        inbox = asyncio.Queue()
+        receiver = asyncio.ensure_future(self._receive(inbox))
+        try:
+            while time.monotonic() < stop and not receiver.done():
+                self.send(self.client.join, self.rng.choice(self.rooms), self.name)
+                self.stats.joins += 1
+                leave = min(stop, time.monotonic() + self.rng.expovariate(1 / self.session))
+                await self.play(inbox, leave)
+                self.send(self.client.leave)
+                self.game = None
+        finally:
+            receiver.cancel()
+            await self.client.close()
+
+    async def _receive(self, inbox):
+        while True:
+            message = await self.client.receive()
+            if message is None:
+                return
+            inbox.put_nowait(message)
+
+    async def play(self, inbox, leave):
+        claim_at = None
+        while True:
+            now = time.monotonic()
+            if now >= leave:
+                return
+            if claim_at is not None and now >= claim_at:
+                self.claim()
+                claim_at = None
+                continue
+            timeout = min(leave, claim_at or leave) - now
+            try:
+                message = await asyncio.wait_for(inbox.get(), timeout)
+            except asyncio.TimeoutError:
+                continue
+            self.stats.received += 1
+            if self.handle(message) and self._claim is None:
+                # The board changed; start looking again
+                claim_at = time.monotonic() + self._think_time()
+
+    def handle(self, message):
+        # Returns whether the board changed
+        kind = message['type']
+        if kind == 'joined':
+            self.player = message['player']
+            self.game = engine.Game(message['seed'])
+            self.game.start()
+            for player, cards, found in message['claims']:
+                self.game.claim(player, cards)
+            return True
+        if self.game is None:
+            return False
+        if kind == 'new-game':
+            self.game = engine.Game(message['seed'])
+            self.game.start()
+            return True
+        if kind == 'claimed':
+            if message['player'] == self.player and self._claim is not None:
+                self.stats.latencies.append(time.monotonic() - self._claim[1])
+                self.stats.wrong += not message['found']
+                self._claim = None
+            found = self.game.claim(message['player'], message['cards'])
+            if self.game.state == engine.Game.STATE_COMPLETE:
+                self.stats.games += message['player'] == self.player
+                self.send(self.client.restart)
+            return found or message['player'] == self.player
+        if kind == 'stale':
+            if self._claim is not None:
+                self.stats.latencies.append(time.monotonic() - self._claim[1])
+                self.stats.stale += 1
+                self._claim = None
+            return True
+        return False
+
+    def claim(self):
+        if self.game.state != engine.Game.STATE_STARTED:
+            return
+        board = self.game.deck.play_deck
+        if self.rng.random() < self.mistakes:
+            cards = self.rng.sample(board, 3)
+        else:
+            sets = STANDARD.all_sets(board)
+            if not sets:
+                return
+            cards = self.rng.choice(sets)
+        self.send(self.client.select, cards)
+        self.send(self.client.claim, cards)
+        self.stats.claims += 1
+        self._claim = cards, time.monotonic()
+
+
+def percentile(values, p):
+    values = sorted(values)
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def start_server(seed):
+    # In its own process, so its CPU time is its own
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    server = subprocess.Popen([sys.executable, '-m', 'setgame.server', '--port', '0', '--seed', str(seed)],
+                              cwd=ROOT, env=env, stdout=subprocess.PIPE, universal_newlines=True)
+    host, port = re.search(r'serving on (\S+):(\d+)', server.stdout.readline()).groups()
+    return server, host, int(port)
+
+
+def stop_server(server):
+    server.send_signal(signal.SIGINT)
+    output = server.communicate(timeout=10)[0]
+    messages, cpu = re.search(r'(\d+) messages received, ([\d.]+)s of CPU', output).groups()
+    return int(messages), float(cpu)
+
+
+async def _load(host, port, bots, rooms, duration, ramp, think, mistakes, session, seed):
+    stats = LoadStats()
+    room_names = ['room {}'.format(i) for i in range(rooms)]
+    start = time.monotonic()
+    stop = start + ramp + duration
+    tasks = []
+    for i in range(bots):
+        # Connections are spread over the ramp so the server's accept queue isn't flooded
+        await asyncio.sleep(max(0, start + ramp * i / bots - time.monotonic()))
+        bot = Bot(i, random.Random('{}:{}'.format(seed, i)), stats, room_names, think, mistakes, session)
+        tasks.append(asyncio.ensure_future(bot.run(host, port, stop)))
+    await asyncio.gather(*tasks)
+    return stats
+
+
+def load_test(bots=BOTS, rooms=ROOMS, duration=DURATION, ramp=RAMP, think=THINK, mistakes=MISTAKES,
+              session=SESSION, seed=SEED):
+    # Returns (results, stats); results are named for the suite, where anything without _per_ is lower-is-better
+    server, host, port = start_server(seed)
+    cpu_start = time.process_time()
+    try:
+        stats = asyncio.run(_load(host, port, bots, rooms, duration, ramp, think, mistakes, session, seed))
+    finally:
+        messages, server_cpu = stop_server(server)
+    bots_cpu = time.process_time() - cpu_start
+    elapsed = ramp + duration
+    results = {
+        'claim latency': {
+            'p50': percentile(stats.latencies, 0.5),
+            'p90': percentile(stats.latencies, 0.9),
+            'p99': percentile(stats.latencies, 0.99),
+            'max': max(stats.latencies, default=None),
+        },
+        # Fractions of a CPU
+        'server cpu': server_cpu / elapsed,
+        'bots cpu': bots_cpu / elapsed,
+        'messages_per_second': {
+            'server in': messages / elapsed,
+            'bots out': stats.sent / elapsed,
+            'bots in': stats.received / elapsed,
+        },
+    }
+    return results, stats
+
+
+def run(bots=200, rooms=50, duration=10, ramp=1, seed=SEED):
+    return load_test(bots, rooms, duration, ramp, seed=seed)[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test a local multiplayer server with bot players.')
+    parser.add_argument('--bots', type=int, default=BOTS)
+    parser.add_argument('--rooms', type=int, default=ROOMS)
+    parser.add_argument('--duration', type=float, default=DURATION, help='seconds of load after the ramp')
+    parser.add_argument('--ramp', type=float, default=RAMP, help='seconds over which bots connect')
+    parser.add_argument('--think', type=float, default=THINK, help='median seconds a bot takes to spot a set')
+    parser.add_argument('--mistakes', type=float, default=MISTAKES, help='fraction of claims that are wrong')
+    parser.add_argument('--session', type=float, default=SESSION, help='mean seconds a bot stays in a room')
+    parser.add_argument('--seed', type=int, default=SEED, help='seeds the bots and the server\'s deals')
+    parser.add_argument('-o', '--output', help='save the report as JSON')
+    args = parser.parse_args()
+
+    config = {name: getattr(args, name)
+              for name in ('bots', 'rooms', 'duration', 'ramp', 'think', 'mistakes', 'session', 'seed')}
+    results, stats = load_test(**config)
+    counts = {
+        'claims': stats.claims,
+        'stale': stats.stale,
+        'wrong': stats.wrong,
+        'joins': stats.joins,
+        'games': stats.games,
+        'connect_errors': stats.connect_errors,
+    }
+    report = {
+        'config': config,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+        'counts': counts,
+    }
+
+    latency = results['claim latency']
+    rates = results['messages_per_second']
+    print('{bots} bots in {rooms} rooms for {duration:g}s (seed {seed})'.format(**config))
+    if stats.latencies:
+        print('claim latency: p50 {:.2f} ms, p90 {:.2f} ms, p99 {:.2f} ms, max {:.2f} ms'.format(
+            *(latency[p] * 1000 for p in ('p50', 'p90', 'p99', 'max'))))
+    print('server: {:.0%} of a CPU, {:.0f} messages/s in'.format(results['server cpu'], rates['server in']))
+    print('bots: {:.0%} of a CPU, {:.0f} messages/s out, {:.0f} messages/s in'.format(
+        results['bots cpu'], rates['bots out'], rates['bots in']))
+    print('{claims} claims ({stale} stale, {wrong} wrong), {joins} joins, {games} games finished, '
+          '{connect_errors} connection errors'.format(**counts))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print('report saved to {}'.format(args.output))
+
+
+if __name__ == '__main__':
+    main()
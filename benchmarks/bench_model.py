@@ -0,0 +1,55 @@
+import itertools
+import random
+import timeit
+
+from setgame import model
+
+
+BOARD_SIZES = 12, 15, 18, 21
+
+
+class _Card:
+    def __init__(self, values):
+        self.values = values
+
+
+def _combinations_all_sets(cards):
+    return list(filter(model.is_set, itertools.combinations(cards, 3)))
+
+
+def _boards(size, count, seed):
+    rng = random.Random(seed)
+    return [rng.sample(model.DECK, size) for _ in range(count)]
+
+
+def run(count=200, repeat=5, seed=0):
+    results = {}
+    for size in BOARD_SIZES:
+        packed = _boards(size, count, seed)
+        cards = [[_Card(model.unpack(code)) for code in board] for board in packed]
+        triples = [list(itertools.combinations(board, 3)) for board in cards]
+        timings = {
+            'is_set(triples)': lambda: [list(map(model.is_set, board)) for board in triples],
+            'combinations': lambda: [_combinations_all_sets(board) for board in cards],
+            'all_sets(cards)': lambda: [model.all_sets(board) for board in cards],
+            'all_sets(packed)': lambda: [model.all_sets(board) for board in packed],
+            'count_sets(packed)': lambda: [model.count_sets(board) for board in packed],
+            'has_set(packed)': lambda: [model.has_set(board) for board in packed],
+        }
+        results[size] = {name: min(timeit.repeat(func, number=1, repeat=repeat)) / count
+                         for name, func in timings.items()}
+    return results
+
+
+def main():
+    results = run()
+    names = list(results[BOARD_SIZES[0]])
+    print('{:>5}  '.format('cards') + '  '.join('{:>18}'.format(name) for name in names) + '  {:>8}'.format('speedup'))
+    for size, timings in results.items():
+        speedup = timings['combinations'] / timings['all_sets(packed)']
+        print('{:>5}  '.format(size) + '  '.join('{:>16.1f}us'.format(timings[name] * 1e6) for name in names) +
+              '  {:>7.1f}x'.format(speedup))
+
+
+if __name__ == '__main__':
+    main()
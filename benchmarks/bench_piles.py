@@ -0,0 +1,118 @@
+import os
+import timeit
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import pygame
+
+from setgame import engine, model, style
+from .bench_render import _Config, _uncached_card
+
+
+PILE_SIZES = (93, 145), (156, 202)
+
+
+class _Card:
+    def __init__(self, values):
+        self.values = values
+
+
+class _PileUpdates(engine.Listener):
+    # The (num_cards, top_card) each pile is rendered with over a game, as SPGame would set them
+    def __init__(self, seed):
+        self.draw_pile = [(81, None)]
+        self.discard_pile = [(0, None)]
+        self._drawn = 0
+        self._discarded = 0
+        engine.play(self._start(seed))
+
+    def _start(self, seed):
+        game = engine.Game(seed, listener=self)
+        game.start()
+        return game
+
+    def on_card_drawn(self, card, index):
+        self._drawn += 1
+        self.draw_pile.append((81 - self._drawn, None))
+
+    def on_card_discarded(self, card, index):
+        self._discarded += 1
+        self.discard_pile.append((self._discarded, _Card(model.unpack(card))))
+
+
+def _uncached_piles(config):
+    # Pile rendering as it was before stacks were cached: every layer and the top card drawn from scratch
+    card = _uncached_card(config)
+
+    def draw_pile(size, num_cards, top_card):
+        card_w, card_h = size[0] // 1.3, size[1] // 1.3
+        surf = pygame.Surface(size, pygame.SRCALPHA)
+        card_x, card_y = 0, surf.get_rect().h - card_h
+        back_img = config.style_get('back', 'card', 'setgame')((card_w, card_h))
+        for _ in range((num_cards + 3) // 6 + 1 if num_cards else 0):
+            surf.blit(back_img, (card_x, card_y))
+            card_x += 2
+            card_y -= 2
+        return surf
+
+    def discard_pile(size, num_cards, top_card):
+        card_w, card_h = size[0] // 1.3, size[1] // 1.3
+        surf = pygame.Surface(size, pygame.SRCALPHA)
+        rect = surf.get_rect()
+        card_x, card_y = rect.w - card_w - 1, rect.h - card_h - 1
+        front_img = config.style_get('front', 'card', 'setgame')((card_w, card_h))
+        for _ in range((num_cards + 3) // 6 + 1 if num_cards else 0):
+            surf.blit(front_img, (card_x, card_y))
+            card_x -= 2
+            card_y -= 2
+        if top_card is not None:
+            surf.blit(card((card_w, card_h), *top_card.values), (card_x + 2, card_y + 2))
+        return surf
+
+    return draw_pile, discard_pile
+
+
+def _composed_piles():
+    config = _Config(style.default_style_pack)
+    style.compose(config)
+    return (config.style_get('background', 'draw-pile', 'setgame'),
+            config.style_get('background', 'discard-pile', 'setgame'))
+
+
+def _render_game(piles, updates, size):
+    draw_pile, discard_pile = piles
+    return ([draw_pile(size, *update) for update in updates.draw_pile] +
+            [discard_pile(size, *update) for update in updates.discard_pile])
+
+
+def run(repeat=5, seed=0):
+    pygame.init()
+    updates = _PileUpdates(seed)
+    results = {}
+    for size in PILE_SIZES:
+        uncached = _uncached_piles(_Config(style.default_style_pack))
+        cached = _composed_piles()
+        _render_game(cached, updates, size)
+        timings = {
+            'before': lambda: _render_game(uncached, updates, size),
+            'cached (cold)': lambda: _render_game(_composed_piles(), updates, size),
+            'cached': lambda: _render_game(cached, updates, size),
+        }
+        results[size] = {name: min(timeit.repeat(func, number=1, repeat=repeat))
+                         for name, func in timings.items()}
+    return results
+
+
+def main():
+    results = run()
+    names = list(results[PILE_SIZES[0]])
+    print('Pile updates over one game')
+    print('{:>9}  '.format('size') + '  '.join('{:>13}'.format(name) for name in names) + '  {:>8}'.format('speedup'))
+    for size, timings in results.items():
+        print('{:>9}  '.format('{}x{}'.format(*size)) +
+              '  '.join('{:>11.2f}ms'.format(timings[name] * 1e3) for name in names) +
+              '  {:>7.1f}x'.format(timings['before'] / timings['cached']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,204 @@
+import argparse
+import asyncio
+import random
+import time
+
+from setgame import protocol
+from setgame.presence import PresenceHub, call_later
+
+
+class FakeUser:
+    # Enough of a UserModel for PublicData's fields
+    def __init__(self, id_, friends):
+        self.id = id_
+        self.name = 'user {}'.format(id_)
+        self.address = '10.0.0.{}'.format(id_ % 256)
+        self.common_addresses = []
+        self.friends = friends
+        self.version = 0
+
+
+class FakeConnection:
+    # Decodes what it's sent into its own view of everyone's presence. It writes out rate bytes per tick,
+    # so a low rate makes it a slow consumer.
+    def __init__(self, rate=None):
+        self.rate = rate
+        self.view = {}
+        self.received = 0
+        self.closed = False
+        self._buffered = 0
+
+    def send(self, data):
+        for message in protocol.decode_frame(data):
+            self.view.setdefault(message['user'], {}).update(message['changes'])
+        self.received += 1
+        self._buffered += len(data)
+
+    def buffered(self):
+        return self._buffered
+
+    def tick(self):
+        self._buffered = 0 if self.rate is None else max(0, self._buffered - self.rate)
+
+    def close(self):
+        self.closed = True
+
+
+def _change(rng, user):
+    if rng.random() < 0.5:
+        user.name = 'user {} {}'.format(user.id, rng.randrange(1000))
+    else:
+        user.address = '10.0.{}.{}'.format(rng.randrange(256), rng.randrange(256))
+    user.version += 1
+
+
+def simulate(users=2000, friends=20, ticks=100, updates=500, slow=0.05, seed=0):
+    # Every tick, updates random users change, each connection writes out what it can, and the hub flushes.
+    # Connections that weren't dropped must end up seeing exactly what their friends published.
+    rng = random.Random(seed)
+    hub = PresenceHub(high_water=256, stall_timeout=20, clock=lambda: tick)
+    people = [FakeUser(i, []) for i in range(users)]
+    for user in people:
+        user.friends = rng.sample(range(users), friends)
+    connections = [FakeConnection(64 if rng.random() < slow else None) for _ in people]
+    followers = [0] * users
+    for user, connection in zip(people, connections):
+        hub.subscribe(connection, [user.id] + user.friends)
+        for id_ in [user.id] + user.friends:
+            followers[id_] += 1
+    # Everyone comes online first, so every user followed has a presence to see
+    tick = 0
+    naive = 0
+    for user in people:
+        hub.publish(user)
+        naive += followers[user.id]
+    hub.flush()
+
+    start = time.perf_counter()
+    for tick in range(ticks):
+        for user in rng.sample(people, updates):
+            _change(rng, user)
+            hub.publish(user)
+            naive += followers[user.id]
+        for connection in connections:
+            connection.tick()
+        hub.flush()
+    # Let everyone catch up
+    for tick in range(ticks, ticks + 10):
+        for connection in connections:
+            connection._buffered = 0
+        hub.flush()
+    elapsed = time.perf_counter() - start
+
+    truth = {user.id: protocol.public_fields(user) for user in people}
+    for user, connection in zip(people, connections):
+        if connection.closed:
+            continue
+        for id_ in [user.id] + user.friends:
+            if connection.view.get(id_) != truth[id_]:
+                raise AssertionError('connection of user {} sees {} as {}, not {}'.format(
+                    user.id, id_, connection.view.get(id_), truth[id_]))
+    return {
+        'tick': elapsed / (ticks + 10),
+        'published': hub.published,
+        'sent': hub.sent,
+        'dropped': hub.dropped,
+        'naive': naive,
+    }
+
+
+async def _scheduled(stall_timeout=0.05):
+    # On an event loop, changes published in one pass go out merged on the next, and a connection that stays
+    # held back is dropped once it stalls even if nothing else is published
+    hub = PresenceHub(schedule=call_later, high_water=0, stall_timeout=stall_timeout)
+    user = FakeUser(0, [])
+    fast, slow = FakeConnection(), FakeConnection()
+    hub.subscribe(fast, [user.id])
+    hub.subscribe(slow, [user.id])
+    for _ in range(3):
+        _change(random.Random(0), user)
+        hub.publish(user)
+        fast.tick()
+    if fast.received:
+        raise AssertionError('the hub sent before the loop came round')
+    await asyncio.sleep(0)
+    # The slow connection takes the first flush, so it's buffered from then on
+    fast.tick()
+    if fast.received != 1 or slow.received != 1:
+        raise AssertionError('three changes went out as {} and {} messages'.format(fast.received, slow.received))
+    _change(random.Random(1), user)
+    hub.publish(user)
+    await asyncio.sleep(stall_timeout * 3)
+    if not slow.closed or fast.closed:
+        raise AssertionError('the stalled connection wasn\'t dropped on its own')
+
+
+def check_scheduled():
+    asyncio.run(_scheduled())
+
+
+def naive_fanout(users=2000, friends=20, updates=2000, seed=0):
+    # What publishing cost before: PublicData built and encoded again for every friend
+    rng = random.Random(seed)
+    people = [FakeUser(i, rng.sample(range(users), friends)) for i in range(users)]
+    start = time.perf_counter()
+    for user in rng.sample(people, updates):
+        _change(rng, user)
+        for friend in user.friends:
+            protocol.encode({'type': 'presence', 'user': user.id, 'changes': protocol.public_fields(user)})
+    return (time.perf_counter() - start) / updates
+
+
+def hub_fanout(users=2000, friends=20, updates=2000, seed=0):
+    rng = random.Random(seed)
+    people = [FakeUser(i, rng.sample(range(users), friends)) for i in range(users)]
+    hub = PresenceHub()
+    connections = {}
+    for user in people:
+        for friend in user.friends:
+            connection = connections.get(friend)
+            if connection is None:
+                connection = connections[friend] = FakeConnection()
+                connection.send = lambda data: None
+            hub.subscribe(connection, [user.id])
+    start = time.perf_counter()
+    for user in rng.sample(people, updates):
+        _change(rng, user)
+        hub.publish(user)
+        hub.flush()
+    return (time.perf_counter() - start) / updates
+
+
+def run(seed=0):
+    check_scheduled()
+    simulate(users=500, ticks=50, updates=100, seed=seed)
+    return {
+        'publish': {
+            'naive': naive_fanout(seed=seed),
+            'hub': hub_fanout(seed=seed),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Drive the presence hub with fake connections.')
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--friends', type=int, default=20)
+    parser.add_argument('--ticks', type=int, default=100)
+    parser.add_argument('--updates', type=int, default=500, help='users whose presence changes each tick')
+    parser.add_argument('--slow', type=float, default=0.05, help='fraction of connections that are slow')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    check_scheduled()
+    results = simulate(args.users, args.friends, args.ticks, args.updates, args.slow, args.seed)
+    print('{published} changes published, {sent} messages sent ({naive} without merging), '
+          '{dropped} slow connections dropped'.format(**results))
+    print('{:.2f} ms per tick; every connection left saw its friends exactly'.format(results['tick'] * 1000))
+    print('publishing to {} friends: {:.1f} us naively, {:.1f} us through the hub'.format(
+        args.friends, naive_fanout(args.users, args.friends, seed=args.seed) * 1e6,
+        hub_fanout(args.users, args.friends, seed=args.seed) * 1e6))
+
+
+if __name__ == '__main__':
+    main()
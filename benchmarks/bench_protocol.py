@@ -0,0 +1,212 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from setgame import engine, protocol
+from setgame.client import Client
+from setgame.server import Server
+
+
+def random_value(rng, kind):
+    if kind == 'uint':
+        return rng.choice((rng.randrange(128), rng.randrange(1 << 40)))
+    if kind == 'bool':
+        return rng.random() < 0.5
+    if kind == 'str':
+        return ''.join(rng.choice('abcdé 漢') for _ in range(rng.randrange(12)))
+    if kind == 'ostr':
+        return None if rng.random() < 0.2 else random_value(rng, 'str')
+    if kind == 'seed':
+        return rng.getrandbits(64)
+    if kind == 'time':
+        return rng.randrange(1 << 36) / 1e6
+    if kind == 'cards':
+        return [rng.randrange(256) for _ in range(rng.randrange(5))]
+    if kind == 'variant':
+        return [rng.randrange(2, 9) for _ in range(3)]
+    if kind == 'players':
+        return {random_value(rng, 'uint'): random_value(rng, 'str') for _ in range(rng.randrange(4))}
+    if kind == 'claims':
+        return [[random_value(rng, 'uint'), random_value(rng, 'cards'), random_value(rng, 'bool')]
+                for _ in range(rng.randrange(4))]
+    if kind in ('strs', 'uints'):
+        return [random_value(rng, kind[:-1]) for _ in range(rng.randrange(4))]
+    if kind == 'changes':
+        return {field: random_value(rng, field_kind) for field, field_kind in protocol.PRESENCE_FIELDS
+                if rng.random() < 0.5}
+    raise ValueError(kind)
+
+
+def random_message(rng):
+    name = rng.choice(sorted(protocol.MESSAGES))
+    message = {'type': name}
+    for field, kind in protocol.MESSAGES[name][1]:
+        message[field] = random_value(rng, kind)
+    return message
+
+
+def fuzz(iterations=10000, seed=0):
+    # Random frames must decode to exactly what was encoded, and random or cut bytes must either decode or raise
+    # ValueError
+    rng = random.Random(seed)
+    for _ in range(iterations):
+        messages = [random_message(rng) for _ in range(rng.randrange(1, 6))]
+        body = b''.join(map(protocol.encode, messages))
+        decoded = protocol.decode_frame(body)
+        if decoded != messages:
+            raise AssertionError('{} decoded as {}'.format(messages, decoded))
+        for broken in (body[:rng.randrange(len(body))], bytes(rng.randrange(256) for _ in range(len(body)))):
+            try:
+                protocol.decode_frame(broken)
+            except ValueError:
+                pass
+
+
+def check_limits():
+    # A varint longer than any field needs is malformed, not an OverflowError
+    code = protocol.MESSAGES['claimed'][0]
+    body = bytes([code, 1, 0, 1]) + b'\xff' * 200 + b'\x01'
+    try:
+        protocol.decode_frame(body)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError('an overlong varint decoded')
+
+
+async def _claim_with_join(seed=0):
+    # A claim read in the same frame as the join that made its room arrives before the room's game started;
+    # the server must still resolve it rather than fail to encode a negative time and drop the connection
+    server = Server(seed=seed)
+    port = await server.start('127.0.0.1', 0)
+    client = await Client.connect('127.0.0.1', port)
+    # The game a seeded server deals first in a room
+    game = engine.Game(random.Random('{}:{}'.format(seed, 'bench')).getrandbits(64))
+    game.start()
+    cards = sorted(next(iter(game.deck.sets)))
+    client.writer.write(protocol.frame([protocol.encode({'type': 'join', 'room': 'bench', 'name': 'player'}),
+                                        protocol.encode({'type': 'claim', 'cards': cards})]))
+    claimed = await asyncio.wait_for(_receive_until(client, 'claimed', []), 5)
+    if not claimed['found'] or claimed['time'] != 0 or 'bench' not in server.rooms:
+        raise AssertionError('claim in the joining frame came back as {}'.format(claimed))
+    await client.close()
+    server.close()
+
+
+async def _rejoin(seed=0):
+    # Joining the room a player is alone in again, as a client does to catch up, must resend that room's game
+    # rather than drop the room and deal a new one
+    server = Server(seed=seed)
+    port = await server.start('127.0.0.1', 0)
+    client = await Client.connect('127.0.0.1', port)
+    client.join('bench', 'player')
+    joined = await asyncio.wait_for(_receive_until(client, 'joined', []), 5)
+    room = server.rooms['bench']
+    client.claim(sorted(next(iter(room.game.deck.sets))))
+    await asyncio.wait_for(_receive_until(client, 'claimed', []), 5)
+    client.join('bench', 'player')
+    rejoined = await asyncio.wait_for(_receive_until(client, 'joined', []), 5)
+    if server.rooms.get('bench') is not room or rejoined['seed'] != joined['seed'] or len(rejoined['claims']) != 1:
+        raise AssertionError('joining again came back as {}'.format(rejoined))
+    await client.close()
+    server.close()
+
+
+def codec_speed(messages=20000, seed=0):
+    rng = random.Random(seed)
+    sample = [random_message(rng) for _ in range(messages)]
+    start = time.perf_counter()
+    encoded = list(map(protocol.encode, sample))
+    encode = (time.perf_counter() - start) / messages
+    body = b''.join(encoded)
+    start = time.perf_counter()
+    protocol.decode_frame(body)
+    decode = (time.perf_counter() - start) / messages
+    return {'encode': encode, 'decode': decode}
+
+
+async def _receive_until(client, kind, seen):
+    while True:
+        message = await client.receive()
+        if message is None:
+            raise AssertionError('the server closed the connection')
+        seen.append(message)
+        if message['type'] == kind:
+            return message
+
+
+def _json_size(messages):
+    # What the same messages would take as lines of JSON
+    return sum(len(json.dumps(message, separators=(',', ':'))) + 1 for message in messages)
+
+
+async def _play(games, seed):
+    rng = random.Random(seed)
+    server = Server()
+    port = await server.start('127.0.0.1', 0)
+    players = [await Client.connect('127.0.0.1', port) for _ in range(2)]
+    seen = []
+    for i, client in enumerate(players):
+        client.join('bench', 'player {}'.format(i))
+        await _receive_until(client, 'joined', seen if i == 0 else [])
+    room = server.rooms['bench']
+    member = room.members[min(room.members)]
+    member.outbox.bytes_sent = 0
+    seen.clear()
+
+    start = time.perf_counter()
+    for _ in range(games):
+        while room.game.state == engine.Game.STATE_STARTED:
+            claimer = rng.choice(players)
+            cards = rng.choice(list(room.game.deck.sets))
+            claimer.select(cards)
+            claimer.claim(cards)
+            await _receive_until(players[0], 'claimed', seen)
+        players[0].restart()
+        await _receive_until(players[0], 'new-game', seen)
+    elapsed = time.perf_counter() - start
+
+    for client in players:
+        await client.close()
+    server.close()
+    return {
+        'game': elapsed / games,
+        'bytes per game': member.outbox.bytes_sent / games,
+        'json bytes per game': _json_size(seen) / games,
+    }
+
+
+def run(games=20, seed=0):
+    fuzz(2000, seed)
+    check_limits()
+    asyncio.run(_claim_with_join(seed))
+    asyncio.run(_rejoin(seed))
+    results = codec_speed(seed=seed)
+    results.update(asyncio.run(_play(games, seed)))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fuzz the wire protocol and measure what a game costs on it.')
+    parser.add_argument('--fuzz', type=int, default=2000, metavar='N', help='random frames to round-trip')
+    parser.add_argument('--games', type=int, default=20)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    fuzz(args.fuzz)
+    check_limits()
+    asyncio.run(_claim_with_join())
+    asyncio.run(_rejoin())
+    print('{} random frames round-tripped in {:.1f}s'.format(args.fuzz, time.perf_counter() - start))
+    results = codec_speed()
+    results.update(asyncio.run(_play(args.games, 0)))
+    print('encode {:.2f} us/message, decode {:.2f} us/message'.format(results['encode'] * 1e6,
+                                                                      results['decode'] * 1e6))
+    print('{:.0f} bytes per game to each player ({:.0f} as JSON lines), {:.1f} ms per game'.format(
+        results['bytes per game'], results['json bytes per game'], results['game'] * 1000))
+
+
+if __name__ == '__main__':
+    main()
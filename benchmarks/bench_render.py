@@ -0,0 +1,100 @@
+import itertools
+import os
+import timeit
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import pygame
+
+from setgame import style
+
+
+CARD_SIZES = (60, 93), (90, 140), (150, 233)
+CARDS = list(itertools.product(range(3), repeat=4))
+
+
+class _Config:
+    # Just enough of hgf's AppConfig for style.compose
+    def __init__(self, style_pack):
+        self.style = {name: {context: dict(styles) for context, styles in contexts.items()}
+                      for name, contexts in style_pack.items()}
+
+    def style_get(self, query, type_, context):
+        return self.style[type_][context][query]
+
+    def style_add(self, query, name, context, value):
+        self.style.setdefault(name, {}).setdefault(context, {})[query] = value
+
+
+def _uncached_card(config):
+    # Card composition as it was before the symbol atlas: every symbol is rendered from scratch
+    def symbol(size, color, texture, shape):
+        s_color = pygame.Surface(size, pygame.SRCALPHA)
+        s_color.fill(config.style_get('symbol-color', 'card', 'setgame')(color))
+        s_texture = config.style_get('symbol-texture', 'card', 'setgame')(size, texture)
+        s_outline, s_mask = config.style_get('symbol-shape', 'card', 'setgame')(size, shape)
+        surf = pygame.Surface(size, pygame.SRCALPHA)
+        s_outline.blit(s_color, (0, 0), None, pygame.BLEND_MULT)
+        surf.blit(s_outline, (0, 0))
+        s_mask.blit(s_texture, (0, 0), None, pygame.BLEND_MULT)
+        s_mask.set_colorkey((0, 0, 0))
+        s_mask.blit(s_color, (0, 0), None, pygame.BLEND_MULT)
+        surf.blit(s_mask, (0, 0))
+        return surf
+
+    def card(size, number, color, texture, shape):
+        card_image = config.style_get('front', 'card', 'setgame')(size, True, False)
+        rect = card_image.get_rect()
+        number += 1
+        sym_w = int(rect.w * 0.75)
+        sym_h = int(rect.h * 0.2)
+        sym_x = (rect.w - sym_w) // 2
+        y_gap = int(rect.h / 4 - sym_h)
+        sym_y = (rect.h - (number * (sym_h + y_gap) - y_gap)) // 2
+        for _ in range(number):
+            card_image.blit(symbol((sym_w, sym_h), color, texture, shape), (sym_x, sym_y))
+            sym_y += sym_h + y_gap
+        return card_image
+
+    return card
+
+
+def _composed_card():
+    config = _Config(style.default_style_pack)
+    style.compose(config)
+    return config.style_get('background', 'card', 'setgame')
+
+
+def _render_all(card, size):
+    return [card(size, *values) for values in CARDS]
+
+
+def run(repeat=5):
+    pygame.init()
+    results = {}
+    for size in CARD_SIZES:
+        uncached = _uncached_card(_Config(style.default_style_pack))
+        atlas = _composed_card()
+        _render_all(atlas, size)
+        timings = {
+            'before': lambda: _render_all(uncached, size),
+            'atlas (cold)': lambda: _render_all(_composed_card(), size),
+            'atlas': lambda: _render_all(atlas, size),
+        }
+        results[size] = {name: min(timeit.repeat(func, number=1, repeat=repeat)) / len(CARDS)
+                         for name, func in timings.items()}
+    return results
+
+
+def main():
+    results = run()
+    names = list(results[CARD_SIZES[0]])
+    print('{:>9}  '.format('size') + '  '.join('{:>12}'.format(name) for name in names) + '  {:>8}'.format('speedup'))
+    for size, timings in results.items():
+        print('{:>9}  '.format('{}x{}'.format(*size)) +
+              '  '.join('{:>10.1f}us'.format(timings[name] * 1e6) for name in names) +
+              '  {:>7.1f}x'.format(timings['before'] / timings['atlas']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+import io
+import time
+
+from setgame import engine, replay
+
+
+def record(seed):
+    f = io.BytesIO()
+    writer = replay.ReplayWriter(f, seed)
+    game = engine.Game(seed, listener=writer)
+    game.start()
+    engine.play(game)
+    return f.getvalue()
+
+
+def run(games=200, seeks=100, seed=0):
+    start = time.perf_counter()
+    for i in range(games):
+        engine.simulate(seed + i)
+    plain = (time.perf_counter() - start) / games
+
+    start = time.perf_counter()
+    logs = [record(seed + i) for i in range(games)]
+    recorded = (time.perf_counter() - start) / games
+
+    start = time.perf_counter()
+    replays = [replay.Replay.from_bytes(data) for data in logs]
+    load = (time.perf_counter() - start) / games
+
+    start = time.perf_counter()
+    for r in replays:
+        for i in range(seeks):
+            r.seek(r.duration * ((i * 37) % seeks) / seeks)
+    seek = (time.perf_counter() - start) / (games * seeks)
+
+    return {
+        'game': plain,
+        'recorded game': recorded,
+        'load and check': load,
+        'seek': seek,
+        'bytes per game': sum(map(len, logs)) / games,
+    }
+
+
+def main():
+    results = run()
+    print('{:.0f} bytes per game'.format(results.pop('bytes per game')))
+    for name, elapsed in results.items():
+        print('{:<16} {:8.3f} ms'.format(name, elapsed * 1000))
+
+
+if __name__ == '__main__':
+    main()
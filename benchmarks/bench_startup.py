@@ -0,0 +1,44 @@
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+from ._app import appdata
+
+
+MAIN = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'main.py')
+RUNS = 10
+
+
+def time_to_first_frame(cwd):
+    # A fresh interpreter each time, so every import is paid for again
+    env = dict(os.environ, SDL_VIDEODRIVER='dummy', SDL_AUDIODRIVER='dummy', PYGAME_HIDE_SUPPORT_PROMPT='1')
+    output = subprocess.run([sys.executable, MAIN, '--profile-startup', '--quit-after-first-frame'],
+                            cwd=cwd, env=env, check=True, stdout=subprocess.PIPE, universal_newlines=True).stdout
+    return float(re.search(r'([\d.]+) ms to the first frame', output).group(1)) / 1000
+
+
+def run(runs=RUNS):
+    with appdata() as root:
+        times = [time_to_first_frame(root) for _ in range(runs)]
+    return {'median': statistics.median(times), 'best': min(times), 'worst': max(times)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time from launching main.py to its first frame.')
+    parser.add_argument('--runs', type=int, default=RUNS)
+    parser.add_argument('--max-ms', type=float, help='exit with an error if the median is slower than this')
+    args = parser.parse_args()
+
+    results = run(args.runs)
+    median = results['median'] * 1000
+    print('time to first frame over {} runs: median {:.1f} ms, best {:.1f} ms, worst {:.1f} ms'.format(
+        args.runs, median, results['best'] * 1000, results['worst'] * 1000))
+    if args.max_ms is not None and median > args.max_ms:
+        sys.exit('regression: median {:.1f} ms is over {:.1f} ms'.format(median, args.max_ms))
+
+
+if __name__ == '__main__':
+    main()
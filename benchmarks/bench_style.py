@@ -0,0 +1,80 @@
+import os
+import timeit
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import pygame
+
+from setgame import style
+from setgame.style import default
+from .bench_render import _Config
+
+
+SIZES = (60, 93), (150, 233), (400, 300)
+
+
+class _Card:
+    def __init__(self, values):
+        self.values = values
+
+
+def _factories(size):
+    # Every factory in style.default, called the way its components call it
+    return {
+        'play_deck_bg': lambda: default.play_deck_bg(size),
+        'clock_bg': lambda: default.clock_bg(size),
+        'card_front': lambda: default.card_front(size),
+        'card_front(selected)': lambda: default.card_front(size, selected=True),
+        'card_back': lambda: default.card_back(size),
+        'symbol_color': lambda: [default.symbol_color(color) for color in range(3)],
+        'symbol_texture': lambda: [default.symbol_texture(size, texture) for texture in range(3)],
+        'symbol_shape': lambda: [default.symbol_shape(size, shape) for shape in range(3)],
+        'button_bg': lambda: [default.button_bg(size, state) for state in range(5)],
+        'text_box_bg': lambda: default.text_box_bg(size, 2),
+        'text_box_cursor_bg': lambda: default.text_box_cursor_bg(size),
+        'unknown_bg': lambda: default.unknown_bg(size),
+    }
+
+
+def _composed():
+    config = _Config(style.default_style_pack)
+    style.compose(config)
+    return {name: config.style_get('background', name, 'setgame') for name in ('card', 'draw-pile', 'discard-pile')}
+
+
+def _composed_factories(size):
+    composed = _composed()
+    top_card = _Card((2, 1, 0, 2))
+    return {
+        'compose': _composed,
+        'card': lambda: composed['card'](size, 2, 1, 0, 2),
+        'card(selected)': lambda: composed['card'](size, 2, 1, 0, 2, selected=True),
+        'card(back)': lambda: composed['card'](size, 2, 1, 0, 2, face_up=False),
+        'draw-pile': lambda: composed['draw-pile'](size, 40, None),
+        'discard-pile': lambda: composed['discard-pile'](size, 40, top_card),
+    }
+
+
+def run(number=20, repeat=5):
+    # Factories that cache are timed warm, after the first call
+    pygame.init()
+    results = {}
+    for size in SIZES:
+        timings = dict(_factories(size), **_composed_factories(size))
+        for func in timings.values():
+            func()
+        results[size] = {name: min(timeit.repeat(func, number=number, repeat=repeat)) / number
+                         for name, func in timings.items()}
+    return results
+
+
+def main():
+    results = run()
+    names = list(results[SIZES[0]])
+    print('{:<22}'.format('factory') + ''.join('{:>14}'.format('{}x{}'.format(*size)) for size in SIZES))
+    for name in names:
+        print('{:<22}'.format(name) + ''.join('{:>12.1f}us'.format(results[size][name] * 1e6) for size in SIZES))
+
+
+if __name__ == '__main__':
+    main()
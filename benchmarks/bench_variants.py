@@ -0,0 +1,46 @@
+import itertools
+import random
+import time
+import timeit
+
+from setgame import engine
+from setgame.model import Variant
+
+
+VARIANTS = (4, 3), (5, 3), (6, 3), (4, 4)
+
+
+def _combinations_all_sets(variant, cards):
+    return [found for found in itertools.combinations(cards, variant.set_size) if variant.is_set(found)]
+
+
+def run(boards=20, games=20, repeat=3, seed=0):
+    rng = random.Random(seed)
+    results = {}
+    for attributes, values in VARIANTS:
+        variant = Variant(attributes, values)
+        timings = {}
+        for size in range(variant.board_size, variant.board_size + 4 * variant.set_size, variant.set_size):
+            sample = [rng.sample(variant.cards, size) for _ in range(boards)]
+            timings['all_sets[{}]'.format(size)] = min(timeit.repeat(
+                lambda: [variant.all_sets(board) for board in sample], number=1, repeat=repeat)) / boards
+            if size == variant.board_size:
+                timings['combinations[{}]'.format(size)] = min(timeit.repeat(
+                    lambda: [_combinations_all_sets(variant, board) for board in sample], number=1, repeat=1)) / boards
+        start = time.perf_counter()
+        for i in range(games):
+            engine.simulate(seed + i, variant=variant)
+        timings['game'] = (time.perf_counter() - start) / games
+        results['{} attributes x {} values'.format(attributes, values)] = timings
+    return results
+
+
+def main():
+    for name, timings in run().items():
+        print(name)
+        for label, seconds in timings.items():
+            print('    {:<20} {:>12.1f}us'.format(label, seconds * 1e6))
+
+
+if __name__ == '__main__':
+    main()
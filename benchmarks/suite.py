@@ -0,0 +1,143 @@
+import argparse
+import datetime
+import importlib
+import json
+import os
+import platform
+import sys
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+
+BENCHMARKS = (
+    'bench_model',
+    'bench_variants',
+    'bench_batch',
+    'bench_engine',
+    'bench_replay',
+    'bench_style',
+    'bench_render',
+    'bench_piles',
+    'bench_game',
+    'bench_protocol',
+    'bench_load',
+    'bench_presence',
+    'bench_startup',
+)
+
+# How much slower a result can get before compare calls it a regression
+THRESHOLD = 0.1
+
+VERSION = 1
+
+
+def _key(part):
+    if isinstance(part, tuple):
+        return 'x'.join(map(str, part))
+    return str(part)
+
+
+def flatten(results, prefix=''):
+    # A benchmark's nested results as {'outer/inner/name': value}
+    flat = {}
+    for part, value in results.items():
+        key = prefix + _key(part)
+        if isinstance(value, dict):
+            flat.update(flatten(value, key + '/'))
+        else:
+            flat[key] = value
+    return flat
+
+
+def higher_is_better(key):
+    # Rates are named like games_per_minute; everything else is a time
+    return '_per_' in key
+
+
+def run(names=BENCHMARKS):
+    results = {}
+    for name in names:
+        try:
+            module = importlib.import_module('.' + name, __package__)
+        except ImportError as err:
+            # Benchmarks of optional features, e.g. setgame.batch without NumPy
+            print('{:<16} skipped: {}'.format(name, err), file=sys.stderr)
+            continue
+        start = time.perf_counter()
+        results.update(flatten(module.run(), name + '/'))
+        print('{:<16} {:>8.1f}s'.format(name, time.perf_counter() - start), file=sys.stderr)
+    return {
+        'version': VERSION,
+        'date': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+    }
+
+
+def compare(before, after, threshold=THRESHOLD):
+    # (key, before, after, change, regressed) for every result in both runs; change > 0 means slower
+    rows = []
+    for key in sorted(before['results'].keys() & after['results'].keys()):
+        old, new = before['results'][key], after['results'][key]
+        if not old or not new:
+            continue
+        change = old / new - 1 if higher_is_better(key) else new / old - 1
+        rows.append((key, old, new, change, change > threshold))
+    return rows
+
+
+def load(filename):
+    with open(filename) as f:
+        report = json.load(f)
+    if report.get('version') != VERSION:
+        raise ValueError('{} is not a version {} benchmark report'.format(filename, VERSION))
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run every benchmark headless and save or compare the results.')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    run_parser = commands.add_parser('run', help='run the benchmarks and save the results as JSON')
+    run_parser.add_argument('-o', '--output', default='benchmarks.json')
+    run_parser.add_argument('benchmarks', nargs='*', metavar='benchmark',
+                            help='benchmarks to run (default: all of {})'.format(', '.join(BENCHMARKS)))
+
+    compare_parser = commands.add_parser('compare', help='flag results that got slower between two runs')
+    compare_parser.add_argument('before')
+    compare_parser.add_argument('after')
+    compare_parser.add_argument('--threshold', type=float, default=THRESHOLD,
+                                help='slowdown to flag as a regression (default: {:.0%})'.format(THRESHOLD))
+    compare_parser.add_argument('--all', action='store_true', help='show every result, not just regressions')
+
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        unknown = set(args.benchmarks) - set(BENCHMARKS)
+        if unknown:
+            parser.error('unknown benchmarks: {}'.format(', '.join(sorted(unknown))))
+        report = run(args.benchmarks or BENCHMARKS)
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print('{} results saved to {}'.format(len(report['results']), args.output))
+        return
+
+    before, after = load(args.before), load(args.after)
+    rows = compare(before, after, args.threshold)
+    regressions = [row for row in rows if row[4]]
+    for key, old, new, change, regressed in rows if args.all else regressions:
+        print('{:<60} {:>12.4g} {:>12.4g} {:>+8.1%}{}'.format(key, old, new, change, '  REGRESSION' if regressed else ''))
+    missing = before['results'].keys() - after['results'].keys()
+    if missing:
+        print('{} results missing from {}'.format(len(missing), args.after))
+    print('{} results compared, {} regressed by more than {:.0%}'.format(len(rows), len(regressions), args.threshold))
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
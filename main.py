@@ -1,10 +1,69 @@
-import pygame
+import argparse
+import contextlib
 
-from setgame import launcher
 
+parser = argparse.ArgumentParser(description='Play Set.')
+parser.add_argument('--profile-startup', action='store_true',
+                    help='report the time spent importing and loading once the first frame is drawn')
+parser.add_argument('--quit-after-first-frame', action='store_true', help=argparse.SUPPRESS)
+parser.add_argument('--profile-frames', action='store_true',
+                    help='time the game\'s components every frame; F8 shows the slowest')
+parser.add_argument('--trace', metavar='FILE', help='with --profile-frames, save a Chrome trace on exit')
+parser.add_argument('--server', metavar='HOST:PORT',
+                    help='multiplayer server to play on (default: this machine, serving one if none is running)')
+parser.add_argument('--name', help='name to play multiplayer games under')
+args = parser.parse_args()
 
-pygame.init()
-pygame.mixer.quit()
+profile = None
+if args.profile_startup:
+    from setgame.startup import StartupProfile
+    profile = StartupProfile(quit_after_first_frame=args.quit_after_first_frame)
+    profile.track_imports()
 
-launcher.load()
-launcher.spawn_app().launch(fps=60, debug=True)
+
+def phase(name):
+    return profile.phase(name) if profile is not None else contextlib.nullcontext()
+
+
+with phase('import'):
+    import hgf
+    import pygame
+
+    from setgame.app import launcher
+
+if profile is not None:
+    profile.track_loads(hgf.Component)
+
+with phase('pygame.init'):
+    pygame.init()
+    pygame.mixer.quit()
+
+with phase('launcher.load'):
+    launcher.load()
+
+with phase('spawn_app'):
+    app = launcher.spawn_app()
+
+app.startup_profile = profile
+if args.server:
+    host, _, port = args.server.rpartition(':')
+    app.server_address = host, int(port)
+app.player_name = args.name
+
+if args.profile_frames:
+    from setgame.card import Card
+    from setgame.clock import Clock
+    from setgame.deck import PlayDeck
+    from setgame.game import GameHandler, SPGame
+    from setgame.pile import Pile
+    from setgame.profiler import FrameProfiler
+
+    profiler = FrameProfiler()
+    profiler.instrument(Card, PlayDeck, Pile, Clock, SPGame, GameHandler)
+    app.attach_profiler(profiler)
+
+app.launch(fps=60, debug=True)
+app.close()
+
+if args.profile_frames and args.trace:
+    profiler.write_trace(args.trace)
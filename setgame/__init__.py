@@ -1,4 +1,9 @@
-from .app import launcher
+__all__ = ['style', 'layout', 'model', 'user']
 
 
-__all__ = ['style', 'layout', 'model', 'user']
+def __getattr__(name):
+    # The launcher pulls in hgf and pygame, so headless users of the package (engine, model) never pay for it
+    if name == 'launcher':
+        from .app import launcher
+        return launcher
+    raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
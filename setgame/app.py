@@ -1,8 +1,113 @@
-from .game import GameHandler
+import functools
+import getpass
+import os
+import time
+
 from .login import LoginScreen
 from . import style
 
 import hgf
+import pygame
+
+
+class _CountingSurface:
+    # Stands in for a component's surface while hgf redraws part of it, counting the blits onto it
+    blits = 0
+
+    def __init__(self, surface):
+        self.surface = surface
+
+    def blit(self, *args, **kwargs):
+        _CountingSurface.blits += 1
+        return self.surface.blit(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.surface, name)
+
+
+def _count_blits(redraw_area):
+    @functools.wraps(redraw_area)
+    def counted(component, rect):
+        display = component._display
+        component._display = _CountingSurface(display)
+        try:
+            return redraw_area(component, rect)
+        finally:
+            component._display = display
+    return counted
+
+
+# Layered components compose their background and children through _redraw_area
+hgf.LayeredComponent._redraw_area = _count_blits(hgf.LayeredComponent._redraw_area)
+# hgf's unregister checks whether the child has focus, which nothing in hgf defines
+hgf.Component.is_focused = False
+
+
+class FrameStats:
+    def __init__(self):
+        self.frames = 0
+        self.time = 0
+        self.render_time = 0
+        self.pixels = 0
+        self.rects = 0
+        self.blits = 0
+
+    def add_frame(self, elapsed, render_time, rects, blits):
+        self.frames += 1
+        self.time += elapsed
+        self.render_time += render_time
+        self.pixels += sum(rect.w * rect.h for rect in rects)
+        self.rects += len(rects)
+        self.blits += blits
+
+    def reset(self):
+        self.__init__()
+
+    def __str__(self):
+        frames = self.frames or 1
+        return '{} frames, {:.2f} ms/frame ({:.2f} ms refreshing and drawing), {:.0f} pixels/frame, ' \
+               '{:.2f} rects/frame, {:.1f} blits/frame'.format(self.frames, self.time / frames,
+                                                               self.render_time * 1000 / frames,
+                                                               self.pixels / frames, self.rects / frames,
+                                                               self.blits / frames)
+
+
+class MainHub(hgf.Hub):
+    # Nodes registered with a factory are only built, and their modules imported, the first time they're entered.
+    # Those registered with rebuild are dropped, and closed if they can be, once left, and built again next time.
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.node_factories = {}
+        self.rebuilt = set()
+
+    def register_lazy_node(self, name, factory, rebuild=False):
+        self.node_factories[name] = factory
+        if rebuild:
+            self.rebuilt.add(name)
+
+    def handle_message(self, sender, message, **params):
+        if message in self.node_factories and message not in self.loc_nodes:
+            self.register_node(message, self.node_factories[message]())
+            # Size and place the new node along with the others
+            self.refresh_proportions_flag = True
+            self.refresh_layout_flag = True
+        left = self.location
+        super().handle_message(sender, message, **params)
+        if self.location is not left:
+            for name in self.rebuilt:
+                if self.loc_nodes.get(name) is left:
+                    self._drop(name)
+
+    def _drop(self, name):
+        node = self.loc_nodes.pop(name)
+        self.unregister(node)
+        if hasattr(node, 'close'):
+            node.close()
+
+    def close(self):
+        for name in list(self.loc_nodes):
+            if name in self.rebuilt:
+                self._drop(name)
 
 
 class SetgameApp(hgf.App):
@@ -13,6 +118,18 @@ class SetgameApp(hgf.App):
         self.main_menu = None
         self.login_screen = None
         self.sp_game = None
+        self.mp_game = None
+        self.server_address = None
+        self.player_name = None
+        self.frame_stats = FrameStats()
+        self.startup_profile = None
+        self.profiler = None
+        self.profiler_overlay = None
+        self.show_profiler = False
+        self._profiler_shown = False
+        self._frame_time = 0
+        self._render_start = 0
+        self._blits_start = 0
 
     def on_load(self):
         self.login_screen = LoginScreen()
@@ -22,11 +139,10 @@ class SetgameApp(hgf.App):
         self.main_menu.add_button('Multiplayer', 'mp')
         self.main_menu.add_button('Quit', 'exit')
 
-        self.sp_game = GameHandler()
-
-        self.main_hub = hgf.Hub()
+        self.main_hub = MainHub()
         self.main_hub.register_center(self.main_menu)
-        self.main_hub.register_node('sp', self.sp_game)
+        self.main_hub.register_lazy_node('sp', self._create_sp_game)
+        self.main_hub.register_lazy_node('mp', self._create_mp_game, rebuild=True)
 
         self.main_seq = hgf.Sequence()
         self.main_seq.register_tail(self.login_screen)
@@ -34,6 +150,53 @@ class SetgameApp(hgf.App):
 
         self.register_load(self.main_seq)
 
+    def attach_profiler(self, profiler):
+        # The overlay starts hidden; F8 shows it
+        from .profiler import ProfilerOverlay
+        self.profiler = profiler
+        self.profiler_overlay = ProfilerOverlay(profiler, self.style_get('font'))
+
+    def _draw_profiler(self):
+        # Drawn over everything, after the components, so the area under it is redrawn first
+        rect = self.profiler_overlay.rect
+        self._redraw_area(hgf.Rect(*rect))
+        if self.show_profiler:
+            self._display.blit(self.profiler_overlay.render(), rect)
+            _CountingSurface.blits += 1
+        self._profiler_shown = self.show_profiler
+        return rect
+
+    def _create_sp_game(self):
+        from .game import GameHandler
+        self.sp_game = GameHandler(replay_dir=self.replay_dir, player_name=self.player_name or getpass.getuser())
+        return self.sp_game
+
+    def _create_mp_game(self):
+        # Connects to the server, or serves one on this machine if none answers there; says so if that fails
+        import asyncio
+        from .multiplayer import MPGameHandler
+        from .server import HOST, PORT
+        address = self.server_address or (HOST, PORT)
+        try:
+            self.mp_game = MPGameHandler(address, self.player_name or getpass.getuser(), replay_dir=self.replay_dir)
+        except (OSError, asyncio.TimeoutError):
+            self.mp_game = None
+            failed = hgf.Menu(title='No server at {}:{}'.format(*address), opacity=0)
+            failed.add_button('Back', hgf.Hub.MSG_RETURN_TO_CENTER)
+            return failed
+        return self.mp_game
+
+    def close(self):
+        # Closes the multiplayer connection, and the server it started, if one is open
+        self.main_hub.close()
+        self.mp_game = None
+
+    @property
+    def replay_dir(self):
+        # With the rest of the app's data, wherever it was started from
+        from .replay import REPLAY_DIR
+        return os.path.join(self._directory.root, REPLAY_DIR)
+
     def refresh_proportions(self):
         super().refresh_proportions()
         self.main_seq.size = self.size
@@ -41,6 +204,42 @@ class SetgameApp(hgf.App):
     def refresh_layout(self):
         self.main_seq.pos = self.pos
 
+    def on_tick(self, elapsed):
+        # The app ticks last, right before the refresh and output passes
+        self._frame_time = elapsed
+        self._render_start = time.perf_counter()
+        self._blits_start = _CountingSurface.blits
+
+    def on_key_down(self, unicode, key, mods):
+        if key == pygame.K_F10:
+            print(self.frame_stats)
+            self.frame_stats.reset()
+        elif key == pygame.K_F8 and self.profiler_overlay is not None:
+            self.show_profiler = not self.show_profiler
+
+    def _step_output(self):
+        # Window._step_output updates the whole display; only push the areas that were redrawn
+        rects = []
+        if hgf.LayeredComponent._step_output(self):
+            if self._dirty_flag:
+                rects = [self._display.get_rect()]
+            else:
+                rects = [rect.as_pygame_rect() for rect in self._dirty_rects]
+        if self.show_profiler or self._profiler_shown:
+            rects.append(self._draw_profiler())
+        if rects:
+            pygame.display.update(rects)
+        self.frame_stats.add_frame(self._frame_time, time.perf_counter() - self._render_start, rects,
+                                   _CountingSurface.blits - self._blits_start)
+        if self.profiler is not None:
+            self.profiler.end_frame()
+        if self.startup_profile is not None:
+            self.startup_profile.on_first_frame()
+            print(self.startup_profile)
+            if self.startup_profile.quit_after_first_frame:
+                pygame.event.post(pygame.event.Event(pygame.QUIT))
+            self.startup_profile = None
+
 
 launcher = hgf.AppManager('setgame', SetgameApp)
 launcher.style_packs = style.style_packs
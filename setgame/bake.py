@@ -0,0 +1,159 @@
+import argparse
+import hashlib
+import itertools
+import mmap
+import os
+import struct
+
+import pygame
+
+from . import style
+
+
+# Where baked faces are kept, under the app's data directory
+CACHE_DIR = 'cache'
+
+# Window sizes baked by default, and the board sizes whose card sizes are baked for each
+WINDOW_SIZES = (1280, 720), (1366, 768), (1600, 900), (1920, 1080)
+BOARD_SIZES = 12, 15, 18
+
+# The card styles a face is drawn from; the functions used, along with the style sources, key the baked files
+PIECES = 'front', 'back', 'symbol-shape', 'symbol-texture', 'symbol-color'
+
+# A file holds a header, then every card's face (unselected) in order of _VALUES, then the back of a card.
+# Pixels are stored as RGBX, which pygame turns into opaque surfaces without converting.
+_MAGIC = b'SETFACES'
+_HEADER = struct.Struct('<8s20sHHH')
+_FORMAT = 'RGBX'
+_VALUES = list(itertools.product(range(3), repeat=4))
+_INDICES = {values: i for i, values in enumerate(_VALUES)}
+
+
+def style_digest(pieces):
+    digest = hashlib.sha1()
+    style_dir = os.path.dirname(style.__file__)
+    for name in sorted(os.listdir(style_dir)):
+        if name.endswith('.py'):
+            with open(os.path.join(style_dir, name), 'rb') as f:
+                digest.update(f.read())
+    for piece in pieces:
+        digest.update('{}.{}'.format(piece.__module__, piece.__qualname__).encode())
+    return digest.digest()
+
+
+def cache_dir(app):
+    return os.path.join(app._directory.root, CACHE_DIR)
+
+
+def faces_path(directory, digest, size):
+    return os.path.join(directory, 'faces-{}-{}x{}.bin'.format(digest.hex()[:12], *size))
+
+
+def bake(factory, digest, size, directory):
+    faces = [factory(size, *values) for values in _VALUES]
+    faces.append(factory(size, *_VALUES[0], face_up=False))
+
+    os.makedirs(directory, exist_ok=True)
+    path = faces_path(directory, digest, size)
+    with open(path + '.tmp', 'wb') as f:
+        f.write(_HEADER.pack(_MAGIC, digest, size[0], size[1], len(faces)))
+        for face in faces:
+            f.write(pygame.image.tostring(face, _FORMAT))
+    os.replace(path + '.tmp', path)
+    return path
+
+
+class BakedFaces:
+    # Surfaces made straight from a memory-mapped file of baked faces. They share the file's pages, so they
+    # are only good for as long as this object is around.
+    def __init__(self, path, digest, size):
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+
+        magic, file_digest, w, h, count = _HEADER.unpack_from(self._map)
+        self.size = w, h
+        self._face_bytes = w * h * 4
+        if magic != _MAGIC or file_digest != digest or self.size != tuple(size) or count != len(_VALUES) + 1 \
+                or len(self._map) != _HEADER.size + count * self._face_bytes:
+            self._map.close()
+            raise ValueError('Stale or damaged baked faces: {}'.format(path))
+        self._view = memoryview(self._map)
+
+    def _surface(self, index):
+        start = _HEADER.size + index * self._face_bytes
+        return pygame.image.frombuffer(self._view[start:start + self._face_bytes], self.size, _FORMAT)
+
+    def face(self, values):
+        return self._surface(_INDICES[tuple(values)])
+
+    def back(self):
+        return self._surface(len(_VALUES))
+
+
+class BakedStore:
+    # Baked faces for one style, opened the first time each size is asked for
+    def __init__(self, digest, directory):
+        self.digest = digest
+        self.directory = directory
+        self._faces = {}
+
+    def find(self, size, values, face_up=True):
+        # None if the size wasn't baked, or for a card of a variant other than the standard one
+        size = tuple(size)
+        if face_up and tuple(values) not in _INDICES:
+            return None
+        if size not in self._faces:
+            try:
+                self._faces[size] = BakedFaces(faces_path(self.directory, self.digest, size), self.digest, size)
+            except (OSError, ValueError):
+                self._faces[size] = None
+        faces = self._faces[size]
+        if faces is None:
+            return None
+        return faces.face(values) if face_up else faces.back()
+
+
+def card_sizes(window_sizes=WINDOW_SIZES, board_sizes=BOARD_SIZES):
+    from .deck import get_card_size, get_grid_dimensions
+    from .game import get_play_deck_size
+
+    sizes = []
+    for window_size in window_sizes:
+        for board_size in board_sizes:
+            size = get_card_size(get_play_deck_size(window_size), get_grid_dimensions(board_size))
+            if size not in sizes:
+                sizes.append(size)
+    return sizes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Pre-render card faces for the configured style.')
+    parser.add_argument('--dir', help='where to save them (default: the app\'s {} directory)'.format(CACHE_DIR))
+    parser.add_argument('--window-size', action='append', metavar='WxH',
+                        help='window size to bake card faces for (default: common sizes)')
+    parser.add_argument('--board-size', action='append', type=int,
+                        help='number of cards on the board to bake card faces for (default: {})'.format(
+                            ', '.join(map(str, BOARD_SIZES))))
+    args = parser.parse_args(argv)
+
+    import hgf
+    from .app import launcher
+
+    # Compose the style the same way the app does, so the faces and the digest match what it would render
+    pygame.init()
+    launcher.load()
+    config = hgf.app.AppConfig(launcher.directory, launcher.resources)
+    config.style_packs = launcher.style_packs
+    config.compose_style = launcher.compose_style
+    config.load()
+    factory = config.style_get('background', 'card', 'setgame')
+    digest = style_digest(config.style_get(piece, 'card', 'setgame') for piece in PIECES)
+
+    window_sizes = [tuple(map(int, size.split('x'))) for size in args.window_size] if args.window_size \
+        else WINDOW_SIZES
+    for size in card_sizes(window_sizes, args.board_size or BOARD_SIZES):
+        print(bake(factory, digest, size, args.dir or os.path.join(launcher.directory.root, CACHE_DIR)))
+
+
+if __name__ == '__main__':
+    main()
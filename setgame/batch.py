@@ -0,0 +1,77 @@
+import itertools
+
+import numpy as np
+
+from . import model
+
+
+# Boards per chunk; memory per chunk grows with chunk_size * k^3.
+CHUNK_SIZE = 4096
+
+# Attribute columns are widened to four bits each so a pair's per-attribute sums never carry into each other,
+# then the packed sums are mapped to the completing card (the per-attribute negation mod 3) through a table.
+_SUM_BITS = 4
+_SHIFTS = np.arange(4) * model._FIELD_BITS
+_SUM_SHIFTS = np.arange(4) * _SUM_BITS
+
+_ATTRS = (np.arange(256)[:, None] >> _SHIFTS) & model._FIELD_MASK
+_WIDE = (_ATTRS << _SUM_SHIFTS).sum(axis=1).astype(np.int16)
+_SUMS = (np.arange(2 * _WIDE.max() + 1)[:, None] >> _SUM_SHIFTS) & 0xf
+_THIRD_OF_SUM = ((-_SUMS % 3) << _SHIFTS).sum(axis=1).astype(np.int16)
+
+
+def _pairs(k):
+    pairs = np.array(list(itertools.combinations(range(k), 2)), dtype=np.intp).reshape(-1, 2)
+    # later[p, c] is True when position c comes after both cards of pair p
+    later = np.arange(k)[None, :] > pairs[:, 1:]
+    return pairs[:, 0], pairs[:, 1], later
+
+
+def _as_boards(boards):
+    boards = np.asarray(boards)
+    if boards.ndim != 2:
+        raise ValueError('Expected an (N boards x k cards) array, got shape {}'.format(boards.shape))
+    return boards.astype(np.int16, copy=False)
+
+
+def _matches(chunk, first, second, later):
+    # matches[n, p, c] is True when card c of board n completes the set started by pair p
+    wide = _WIDE[chunk]
+    thirds = _THIRD_OF_SUM[wide[:, first] + wide[:, second]]
+    return (thirds[:, :, None] == chunk[:, None, :]) & later
+
+
+def _solve(boards, chunk_size):
+    boards = _as_boards(boards)
+    first, second, later = _pairs(boards.shape[1])
+    for start in range(0, len(boards), chunk_size):
+        yield start, first, second, _matches(boards[start:start + chunk_size], first, second, later)
+
+
+def count_sets(boards, chunk_size=CHUNK_SIZE):
+    counts = np.zeros(len(boards), dtype=np.int64)
+    for start, _, _, matches in _solve(boards, chunk_size):
+        counts[start:start + len(matches)] = np.count_nonzero(matches, axis=(1, 2))
+    return counts
+
+
+def has_set(boards, chunk_size=CHUNK_SIZE):
+    mask = np.zeros(len(boards), dtype=bool)
+    for start, _, _, matches in _solve(boards, chunk_size):
+        mask[start:start + len(matches)] = matches.any(axis=(1, 2))
+    return mask
+
+
+def all_sets(boards, chunk_size=CHUNK_SIZE):
+    # Rows of (board, i, j, k) card positions, in the same order model.all_sets would list them
+    found = [np.empty((0, 4), dtype=np.intp)]
+    for start, first, second, matches in _solve(boards, chunk_size):
+        n, p, c = np.nonzero(matches)
+        found.append(np.stack([n + start, first[p], second[p], c], axis=1))
+    return np.concatenate(found)
+
+
+def random_boards(n, k, seed=None):
+    rng = np.random.default_rng(seed)
+    deck = np.array(model.DECK, dtype=np.int16)
+    return deck[np.argsort(rng.random((n, len(deck))), axis=1)[:, :k]]
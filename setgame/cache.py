@@ -0,0 +1,64 @@
+import collections
+
+
+# Enough for a few board layouts' worth of card faces at typical window sizes
+MAX_BYTES = 64 * 1024 * 1024
+
+
+def surface_bytes(surface):
+    return surface.get_pitch() * surface.get_height()
+
+
+class SurfaceCache:
+    # LRU cache of finished surfaces, bounded by the memory their pixels take up. Surfaces are shared between
+    # everyone who asks for the same key, so callers must not draw on them.
+    def __init__(self, max_bytes=MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = collections.OrderedDict()
+
+    def get(self, key, render):
+        surface = self.find(key)
+        if surface is None:
+            surface = render()
+            self.put(key, surface)
+        return surface
+
+    def find(self, key):
+        try:
+            surface = self._entries[key]
+        except KeyError:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return surface
+
+    def put(self, key, surface):
+        if key in self._entries:
+            self.bytes -= surface_bytes(self._entries.pop(key))
+        self._entries[key] = surface
+        self.bytes += surface_bytes(surface)
+        while self.bytes > self.max_bytes and len(self._entries) > 1:
+            _, evicted = self._entries.popitem(last=False)
+            self.bytes -= surface_bytes(evicted)
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+        self.bytes = 0
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __str__(self):
+        return '{} surfaces ({:.1f} MiB), {} hits, {} misses ({:.1%} hit rate), {} evictions'.format(
+            len(self), self.bytes / (1024 * 1024), self.hits, self.misses, self.hit_rate, self.evictions)
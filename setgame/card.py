@@ -1,4 +1,11 @@
+import functools
+
 import hgf
+import pygame
+
+from . import bake
+from .cache import SurfaceCache
+from .render import BackgroundRenderer
 
 
 class Card(hgf.SimpleWidget):
@@ -8,10 +15,22 @@ class Card(hgf.SimpleWidget):
     IN_PLAY = 1
     IN_DISCARD = 2
 
+    # Finished card faces, shared by every card and keyed by the style's background factory
+    surface_cache = SurfaceCache()
+    _cached_factory = None
+
+    # Faces pre-rendered to disk for the current style, if any were baked; see setgame.bake
+    baked = None
+
+    # Renders the faces of resized cards on the board off the UI thread; see PlayDeck.on_tick
+    renderer = BackgroundRenderer()
+
     def __init__(self, values, **kwargs):
         super().__init__(opacity=2, **kwargs)
         self.type = 'card'
         self._bg_factory = None
+        self._face = None
+        self._resized = False
 
         self.values = values
 
@@ -21,13 +40,64 @@ class Card(hgf.SimpleWidget):
         self.is_face_up = True
 
     def load_style(self):
-        self._bg_factory = self.style_get('background')
+        factory = self.style_get('background')
+        if factory is not Card._cached_factory:
+            # Faces from an old style will never be asked for again
+            Card.surface_cache.clear()
+            Card._cached_factory = factory
+            Card.baked = bake.BakedStore(bake.style_digest(self.style_get(piece) for piece in bake.PIECES),
+                                         bake.cache_dir(self.app))
+        self._bg_factory = factory
 
     def refresh_background(self):
-        self.background = self._bg_factory(self.size,
-                                           *self.values,
-                                           face_up=self.is_face_up,
-                                           selected=self.is_selected)
+        key = self._background_key()
+        face = Card.surface_cache.find(key)
+        if face is None and not self.is_selected:
+            face = Card.baked.find(self.size, self.values, self.is_face_up)
+            if face is not None:
+                Card.surface_cache.put(key, face)
+        if face is None and self._resized and self.old_is_active and self._face is not None:
+            # Stretch the face already on screen until the new one comes back from the renderer
+            self._resized = False
+            Card.renderer.submit(self, key, functools.partial(self._bg_factory,
+                                                              self.size,
+                                                              *self.values,
+                                                              face_up=self.is_face_up,
+                                                              selected=self.is_selected))
+            self.background = pygame.transform.scale(self._face, self.size)
+            return
+        if face is None:
+            face = self._render_background()
+            Card.surface_cache.put(key, face)
+        self._resized = False
+        Card.renderer.cancel(self)
+        self._face = self.background = face
+
+    def _background_key(self):
+        size = tuple(self.size)
+        if self.is_face_up:
+            return self._bg_factory, size, self.values, True, self.is_selected
+        return self._bg_factory, size, False
+
+    def _render_background(self):
+        return self._bg_factory(self.size,
+                                *self.values,
+                                face_up=self.is_face_up,
+                                selected=self.is_selected)
+
+    def on_background_rendered(self, key, face):
+        if key == self._background_key():
+            self._face = self.background = face
+
+    def on_w_transition(self):
+        super().on_w_transition()
+        self._resized = True
+        self.refresh_background_flag = True
+
+    def on_h_transition(self):
+        super().on_h_transition()
+        self._resized = True
+        self.refresh_background_flag = True
 
     @hgf.double_buffer
     class is_face_up:
@@ -0,0 +1,126 @@
+import asyncio
+import collections
+import threading
+
+from . import protocol
+from .server import HOST, PORT, Server
+
+
+# Seconds to wait for a server to accept the connection
+CONNECT_TIMEOUT = 2
+
+
+class Requests:
+    # What a client can ask of the server, given a send(message)
+    def join(self, room, name):
+        self.send({'type': 'join', 'room': room, 'name': name})
+
+    def leave(self):
+        self.send({'type': 'leave'})
+
+    def select(self, cards):
+        self.send({'type': 'select', 'cards': list(cards)})
+
+    def claim(self, cards):
+        self.send({'type': 'claim', 'cards': list(cards)})
+
+    def restart(self):
+        self.send({'type': 'restart'})
+
+
+class Client(Requests):
+    # A connection to a server, for asyncio code
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self._received = collections.deque()
+
+    @classmethod
+    async def connect(cls, host=HOST, port=PORT):
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), CONNECT_TIMEOUT)
+        return cls(reader, writer)
+
+    def send(self, message):
+        self.writer.write(protocol.frame([protocol.encode(message)]))
+
+    async def receive(self):
+        # The next message, or None once the server has closed the connection
+        while not self._received:
+            messages = await protocol.read_frame(self.reader)
+            if messages is None:
+                return None
+            self._received.extend(messages)
+        return self._received.popleft()
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+class ThreadedClient(Requests):
+    # A Client running on a background thread's event loop, for the game's main loop: send() doesn't wait,
+    # and received messages are collected with poll() each tick. If no server answers at the default address on
+    # this machine, it can serve one itself on the same thread, so multiplayer works on a single machine.
+    def __init__(self):
+        self.server = None
+        self.closed = False
+        self._client = None
+        self._received = collections.deque()
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='client', daemon=True)
+        self._thread.start()
+
+    def _run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    def connect(self, host=HOST, port=PORT, serve=True):
+        try:
+            self._client = self._run(Client.connect(host, port))
+        except (OSError, asyncio.TimeoutError):
+            if not serve or host != HOST:
+                raise
+            self.server = Server()
+            port = self._run(self.server.start(host, port))
+            self._client = self._run(Client.connect(host, port))
+        asyncio.run_coroutine_threadsafe(self._receive(), self._loop)
+
+    async def _receive(self):
+        try:
+            while True:
+                message = await self._client.receive()
+                if message is None:
+                    break
+                self._received.append(message)
+        except (ConnectionError, ValueError):
+            pass
+        self.closed = True
+
+    def send(self, message):
+        self._loop.call_soon_threadsafe(self._client.send, message)
+
+    def poll(self):
+        # Every message received since the last call
+        while self._received:
+            yield self._received.popleft()
+
+    def close(self):
+        # Closes the connection and any server it started, and waits for the thread to finish
+        if self._loop.is_closed():
+            return
+        self._run(self._close())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    async def _close(self):
+        if self._client is not None:
+            try:
+                await self._client.close()
+            except ConnectionError:
+                pass
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        # Whatever is left, like the receiver, ends now that its connection is closed
+        tasks = asyncio.all_tasks() - {asyncio.current_task()}
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -2,21 +2,33 @@ from .card import Card
 
 import hgf
 
-import random
-import itertools
+
+def get_grid_dimensions(num_slots):
+    rows = 3
+    cols = max((num_slots + 2) // rows, 1)
+    if num_slots <= 6:
+        rows = max(num_slots // 3, 1)
+        cols = 3
+    return rows, cols
+
+
+def get_card_size(deck_size, dimensions):
+    w, h = deck_size
+    return min(int(w / (dimensions[1] + 1)), int(w / 5)),\
+        min(int(h / (dimensions[0] + 0.5)), int(h / 3.5))
 
 
 class PlayDeck(hgf.LayeredComponent):
     MSG_SET_SELECTED = 'set-selected'
+    MSG_CARD_SELECTED = 'card-selected'
 
-    def __init__(self, **kwargs):
+    def __init__(self, deck, **kwargs):
         super().__init__(opacity=1, **kwargs)
         self.type = 'play-deck'
 
+        self.deck = deck
         self.cards = None
-        self._draw_deck = []
-        self._play_deck = []
-        self._discard_deck = []
+        self._cards_by_code = None
         self._selected = []
 
         self._bg_factory = None
@@ -24,35 +36,55 @@ class PlayDeck(hgf.LayeredComponent):
         self.dimensions = 0, 0
 
     def on_load(self):
-        self.cards = [Card(values, active=False) for values in itertools.product((0, 1, 2), repeat=4)]
-        random.shuffle(self.cards)
+        self._cards_by_code = {code: Card(self.deck.variant.unpack(code), active=False)
+                               for code in self.deck.cards}
+        self.cards = list(self._cards_by_code.values())
         self.register_load(*self.cards)
 
-        self._draw_deck = self.cards[:]
-
     def refresh_proportions(self):
         super().refresh_proportions()
-        self.dimensions = self._dim_from_num()
-        old_card_size = self.cards[0].size
+        self.refresh_background_flag = True
+        self.refresh_dimensions_flag = True
+
+    @hgf.responsive(init=True)
+    def refresh_dimensions(self):
+        # Cards coming and going can change the grid without changing the deck's own size
+        dimensions = self._dim_from_num()
+        if dimensions == self.dimensions and self.cards[0].size == self._card_size_from_dim():
+            return
+        self.dimensions = dimensions
         card_size = self._card_size_from_dim()
-        if old_card_size != card_size:
-            for card in self.cards:
-                card.size = card_size
-                card.on_w_transition()
-                card.on_h_transition()
+        for card in self.cards:
+            card.size = card_size
+        # Cards off the board pick up their new size, and render it, when they are next drawn
+        for card in self.play_deck:
+            card.on_w_transition()
+            card.on_h_transition()
+        self.refresh_layout_flag = True
+
+    def on_tick(self, elapsed):
+        super().on_tick(elapsed)
+        for card, key, face in Card.renderer.finished():
+            Card.surface_cache.put(key, face)
+            card.on_background_rendered(key, face)
 
     def refresh_layout(self):
+        for card in self.play_deck:
+            self._place(card)
+
+    def _place(self, card):
+        # Only cards that actually move are marked dirty
         rows, cols = self.dimensions
-        half_gap_w = (self.w - (self.w // cols) * (cols - 1) - self.cards[0].w) // 2
-        half_gap_h = (self.h - (self.h // rows) * (rows - 1) - self.cards[0].h) // 2
-        for card in self.cards:
-            if card.location == Card.IN_PLAY:
-                card.x = half_gap_w + (self.w // cols) * (card.index % cols)
-                card.y = half_gap_h + (self.h // rows) * (card.index // cols)
-                if card.is_selected:
-                    card.y -= 10
-                card.on_x_transition()
-                card.on_y_transition()
+        half_gap_w = (self.w - (self.w // cols) * (cols - 1) - card.w) // 2
+        half_gap_h = (self.h - (self.h // rows) * (rows - 1) - card.h) // 2
+        x = half_gap_w + (self.w // cols) * (card.index % cols)
+        y = half_gap_h + (self.h // rows) * (card.index // cols)
+        if card.is_selected:
+            y -= 10
+        if (x, y) != card.pos:
+            card.pos = x, y
+            card.on_x_transition()
+            card.on_y_transition()
 
     def load_style(self):
         self._bg_factory = self.style_get('background')
@@ -61,74 +93,62 @@ class PlayDeck(hgf.LayeredComponent):
         self.background = self._bg_factory(self.size)
 
     def _dim_from_num(self):
-        num_in_play = len(self.play_deck)
-        rows = 3
-        cols = max((num_in_play + 2) // rows, 1)
-        if num_in_play <= 6:
-            rows = max(num_in_play // 3, 1)
-            cols = 3
-        return rows, cols
+        # Cards keep their slots until the board is compacted, so make room for every slot
+        return get_grid_dimensions(len(self.deck.slots))
 
     def _card_size_from_dim(self):
-        return min(int(self.w / (self.dimensions[1] + 1)), int(self.w / 5)),\
-               min(int(self.h / (self.dimensions[0] + 0.5)), int(self.h / 3.5))
+        return get_card_size(self.size, self.dimensions)
 
     @property
     def draw_deck(self):
-        return tuple(self._draw_deck)
+        return tuple(map(self.get_card, self.deck.draw_deck))
 
     @property
     def play_deck(self):
-        return tuple(self._play_deck)
+        return tuple(map(self.get_card, self.deck.play_deck))
 
     @property
     def discard_deck(self):
-        return tuple(self._discard_deck)
+        return tuple(map(self.get_card, self.deck.discard_deck))
 
-    def shuffle(self):
-        for card in self.cards:
-            card.shuffle()
-        random.shuffle(self.cards)
-        self._draw_deck = self.cards[:]
-        self._play_deck = []
-        self._discard_deck = []
-        self.refresh_layout_flag = True
+    def get_card(self, code):
+        return self._cards_by_code[code]
+
+    def get_selected(self):
+        return [card for card in self.play_deck if card.is_selected]
 
     def shuffle_play(self):
-        random.shuffle(self._play_deck)
-        for i, card in enumerate(self._play_deck):
+        self.deck.shuffle_play()
+        for i, card in enumerate(self.play_deck):
             card.index = i
         self.refresh_layout_flag = True
 
-    def get_selected(self):
-        return list(filter(lambda x: x.selected, self._play_deck))
-
-    def draw_card(self, index=None):
-        if index is None:
-            index = random.randrange(len(self._play_deck) + 1)
-        for card in self._play_deck[index:]:
-            card.index += 1
-        next_card = self._draw_deck.pop()
-        next_card.draw_card(index)
-        self._play_deck.insert(index, next_card)
+    def on_card_drawn(self, code, slot):
+        self.get_card(code).draw_card(slot)
+        self.refresh_dimensions_flag = True
+        self.refresh_layout_flag = True
+
+    def on_card_discarded(self, code, slot):
+        self.get_card(code).discard()
+        self.refresh_dimensions_flag = True
+
+    def on_card_moved(self, code, before, after):
+        self.get_card(code).index = after
         self.refresh_layout_flag = True
-        return next_card
-
-    def discard(self, index):
-        to_discard = self._play_deck.pop(index)
-        to_discard.discard()
-        self._discard_deck.append(to_discard)
-        for card in self._play_deck[index:]:
-            card.index -= 1
+
+    def on_deck_shuffled(self):
+        for card in self.cards:
+            card.shuffle()
         self.refresh_layout_flag = True
-        return to_discard
 
     def handle_message(self, sender, message, **params):
         if message == Card.MSG_TOGGLE_SELECTED:
-            self.refresh_layout_flag = True
+            self._place(sender)
+            self.send_message(PlayDeck.MSG_CARD_SELECTED, card=self.deck.variant.pack(sender.values),
+                              selected=params['selected'])
             if params['selected']:
                 self._selected.append(sender)
-                if len(self._selected) == 3:
+                if len(self._selected) == self.deck.variant.set_size:
                     self.send_message(PlayDeck.MSG_SET_SELECTED, cards=tuple(self._selected))
             else:
                 self._selected.remove(sender)
@@ -0,0 +1,198 @@
+import collections
+import itertools
+
+from .model import STANDARD
+
+
+MAX_ENTRIES = 200000
+
+# Rounds of signature refinement before falling back to trying every tied labeling
+_REFINE_ROUNDS = 2
+
+
+class TranspositionTable:
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        try:
+            value = self._entries[key]
+        except KeyError:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __str__(self):
+        return '{} entries, {} hits, {} misses ({:.1%} hit rate), {} evictions'.format(
+            len(self), self.hits, self.misses, self.hit_rate, self.evictions)
+
+
+class EndgameSearch:
+    # Exhaustive search over the order in which sets are claimed from a position, following the engine's rules.
+    # Positions are a board (any order) and the cards left to draw, next card first. With play_out, sets can
+    # still be claimed once the draw deck runs dry, instead of the game ending below board_size cards.
+    def __init__(self, variant=STANDARD, table=None, play_out=False):
+        self.variant = variant
+        self.table = TranspositionTable() if table is None else table
+        self.play_out = play_out
+        self.nodes = 0
+
+    def max_sets(self, board, draws):
+        return self._max_sets(frozenset(board), tuple(draws))
+
+    def can_clear(self, board, draws):
+        board, draws = frozenset(board), tuple(draws)
+        total = len(board) + len(draws)
+        return total % self.variant.set_size == 0 and \
+            self._max_sets(board, draws) == total // self.variant.set_size
+
+    def _max_sets(self, board, draws):
+        self.nodes += 1
+        key = self.canonical(board, draws)
+        best = self.table.get(key)
+        if best is not None:
+            return best
+
+        best = 0
+        bound = (len(board) + len(draws)) // self.variant.set_size
+        for found in self.variant.all_sets(list(board)):
+            after = self._claim(board, draws, found)
+            value = 1 if after is None else 1 + self._max_sets(*after)
+            if value > best:
+                best = value
+                if best == bound:
+                    break
+
+        self.table.put(key, best)
+        return best
+
+    def _claim(self, board, draws, found):
+        # Mirrors engine.Game.find_set and populate_play_deck; returns None once the game ends
+        variant = self.variant
+        board = set(board)
+        board.difference_update(found)
+
+        size, drawn = len(board) + len(found), 0
+        for _ in found:
+            size -= 1
+            if size < variant.board_size and drawn < len(draws):
+                size += 1
+                drawn += 1
+        board.update(draws[:drawn])
+        draws = draws[drawn:]
+
+        while True:
+            if len(board) >= variant.board_size or self.play_out and len(draws) < variant.set_size:
+                if variant.has_set(board):
+                    return frozenset(board), draws
+            if len(draws) < variant.set_size:
+                return None
+            board.update(draws[:variant.set_size])
+            draws = draws[variant.set_size:]
+
+    def canonical(self, board, draws):
+        # The smallest image of the position under attribute permutations and value relabelings. Only
+        # labelings that order attributes and values by an invariant signature are tried; the signatures
+        # move with the labels, so equivalent positions try the same images and get the same key.
+        variant = self.variant
+        attributes, values = range(variant.attributes), range(variant.values)
+        board_cards = [variant.unpack(card) for card in board]
+        draw_cards = [variant.unpack(card) for card in draws]
+        cards = board_cards + draw_cards
+        on_board = len(board_cards)
+
+        # Cards start out described by how many attributes they share with each other card
+        agreement = [[sum(x == y for x, y in zip(card, other)) for other in cards] for card in cards]
+        card_sigs = _ranked([(i - on_board if i >= on_board else -1,
+                              tuple(sorted(row[:on_board])), tuple(row[on_board:]))
+                             for i, row in enumerate(agreement)])
+        for _ in range(_REFINE_ROUNDS):
+            sigs = _ranked_rows([[self._value_sig(cards, on_board, card_sigs, a, x) for x in values]
+                                 for a in attributes])
+            card_sigs = _ranked([(card_sigs[i], tuple(sorted(sigs[a][card[a]] for a in attributes)))
+                                 for i, card in enumerate(cards)])
+        sigs = _ranked_rows([[(sigs[a][x], self._value_sig(cards, on_board, card_sigs, a, x)) for x in values]
+                             for a in attributes])
+
+        attr_sigs = [tuple(sorted(sigs[a])) for a in attributes]
+        attr_orders = _tied_orders(attributes, attr_sigs.__getitem__)
+        value_orders = [list(_tied_orders(values, sigs[a].__getitem__)) for a in attributes]
+
+        best = None
+        for attr_order in attr_orders:
+            for labelings in itertools.product(*(value_orders[a] for a in attr_order)):
+                relabel = [{old: new for new, old in enumerate(labeling)} for labeling in labelings]
+
+                def image(card):
+                    return variant.pack([relabel[p][card[a]] for p, a in enumerate(attr_order)])
+
+                key = tuple(map(image, draw_cards)), tuple(sorted(map(image, board_cards)))
+                if best is None or key < best:
+                    best = key
+        return best
+
+    @staticmethod
+    def _value_sig(cards, on_board, card_sigs, a, x):
+        # The cards with value x for attribute a: board cards in any order, cards to draw in order
+        return (tuple(sorted(card_sigs[i] for i in range(on_board) if cards[i][a] == x)),
+                tuple(card_sigs[i] for i in range(on_board, len(cards)) if cards[i][a] == x))
+
+
+def _ranked(sigs):
+    # Replaces signatures with their rank, which keeps their order but keeps them small
+    ranks = {sig: rank for rank, sig in enumerate(sorted(set(sigs)))}
+    return [ranks[sig] for sig in sigs]
+
+
+def _ranked_rows(rows):
+    ranks = {sig: rank for rank, sig in enumerate(sorted({sig for row in rows for sig in row}))}
+    return [[ranks[sig] for sig in row] for row in rows]
+
+
+def _tied_orders(items, key):
+    # Every ordering of items sorted by key, permuting only among items with equal keys
+    groups = [list(group) for _, group in itertools.groupby(sorted(items, key=key), key=key)]
+    for parts in itertools.product(*(itertools.permutations(group) for group in groups)):
+        yield tuple(itertools.chain.from_iterable(parts))
+
+
+def position(game):
+    # The board and the cards left to draw (next card first) of an engine.Game
+    return list(game.deck.play_deck), list(reversed(game.deck.draw_deck))
+
+
+def analyze(game, table=None, play_out=False):
+    search = EndgameSearch(game.variant, table, play_out)
+    board, draws = position(game)
+    max_sets = search.max_sets(board, draws) if game.state == game.STATE_STARTED else 0
+    return {
+        'max_sets': max_sets,
+        'can_clear': max_sets * game.variant.set_size == len(board) + len(draws),
+        'nodes': search.nodes,
+        'table': str(search.table),
+        'hit_rate': search.table.hit_rate,
+    }
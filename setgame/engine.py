@@ -0,0 +1,253 @@
+import heapq
+import random
+
+from .model import STANDARD, FoundSet, SetIndex
+
+
+class Listener:
+    def on_card_drawn(self, card, index): pass
+
+    def on_card_discarded(self, card, index): pass
+
+    def on_card_moved(self, card, before, after): pass
+
+    def on_deck_shuffled(self): pass
+
+    def on_board_checked(self, found_set): pass
+
+    def on_claim(self, player, cards, found): pass
+
+    def on_game_started(self): pass
+
+    def on_game_ended(self): pass
+
+
+class Listeners(Listener):
+    # Passes every event on to each of a list of listeners, which can change during a game
+    def __init__(self, *listeners):
+        self.listeners = list(listeners)
+
+    def on_card_drawn(self, card, index):
+        for listener in self.listeners:
+            listener.on_card_drawn(card, index)
+
+    def on_card_discarded(self, card, index):
+        for listener in self.listeners:
+            listener.on_card_discarded(card, index)
+
+    def on_card_moved(self, card, before, after):
+        for listener in self.listeners:
+            listener.on_card_moved(card, before, after)
+
+    def on_deck_shuffled(self):
+        for listener in self.listeners:
+            listener.on_deck_shuffled()
+
+    def on_board_checked(self, found_set):
+        for listener in self.listeners:
+            listener.on_board_checked(found_set)
+
+    def on_claim(self, player, cards, found):
+        for listener in self.listeners:
+            listener.on_claim(player, cards, found)
+
+    def on_game_started(self):
+        for listener in self.listeners:
+            listener.on_game_started()
+
+    def on_game_ended(self):
+        for listener in self.listeners:
+            listener.on_game_ended()
+
+
+class Deck:
+    # The board is a row of slots. Drawing fills a free slot and discarding frees one, so no other card moves
+    # until compact() closes the gaps a found set left behind.
+    def __init__(self, variant=STANDARD, rng=None, listener=None):
+        self.variant = variant
+        self.rng = random.Random() if rng is None else rng
+        self.listener = Listener() if listener is None else listener
+
+        self.cards = list(variant.cards)
+        self.rng.shuffle(self.cards)
+
+        self.draw_deck = self.cards[:]
+        self.slots = []
+        self.discard_deck = []
+        self.sets = SetIndex(variant=self.variant)
+        self._free_slots = []
+        self._slots_by_card = {}
+
+    @property
+    def play_deck(self):
+        return [card for card in self.slots if card is not None]
+
+    @property
+    def num_in_play(self):
+        return len(self._slots_by_card)
+
+    def slot(self, card):
+        return self._slots_by_card[card]
+
+    def is_in_play(self, card):
+        return card in self._slots_by_card
+
+    def shuffle(self):
+        # Starts from the variant's order, so the deal depends only on the state of rng
+        self.cards = list(self.variant.cards)
+        self.rng.shuffle(self.cards)
+        self.draw_deck = self.cards[:]
+        self.slots = []
+        self.discard_deck = []
+        self.sets = SetIndex(variant=self.variant)
+        self._free_slots = []
+        self._slots_by_card = {}
+        self.listener.on_deck_shuffled()
+
+    def shuffle_play(self):
+        self.compact()
+        self.rng.shuffle(self.slots)
+        self._slots_by_card = {card: slot for slot, card in enumerate(self.slots)}
+
+    def draw_card(self, slot=None):
+        # Fills the given slot, else the lowest free one, else a new slot at the end
+        if slot is not None:
+            self._free_slots.remove(slot)
+            heapq.heapify(self._free_slots)
+        elif self._free_slots:
+            slot = heapq.heappop(self._free_slots)
+        else:
+            slot = len(self.slots)
+            self.slots.append(None)
+        card = self.draw_deck.pop()
+        self.slots[slot] = card
+        self._slots_by_card[card] = slot
+        self.sets.add(card)
+        self.listener.on_card_drawn(card, slot)
+        return card
+
+    def discard(self, slot):
+        card = self.slots[slot]
+        self.slots[slot] = None
+        heapq.heappush(self._free_slots, slot)
+        del self._slots_by_card[card]
+        self.discard_deck.append(card)
+        self.sets.remove(card)
+        self.listener.on_card_discarded(card, slot)
+        return card
+
+    def snapshot(self):
+        # Enough to restore the deck, given the same shuffle: cards are drawn from the end of self.cards
+        return tuple(self.slots), len(self.draw_deck), tuple(self.discard_deck)
+
+    def restore(self, snapshot):
+        slots, num_draw, discards = snapshot
+        self.slots = list(slots)
+        self.draw_deck = self.cards[:num_draw]
+        self.discard_deck = list(discards)
+        self._free_slots = [slot for slot, card in enumerate(self.slots) if card is None]
+        self._slots_by_card = {card: slot for slot, card in enumerate(self.slots) if card is not None}
+        self.sets = SetIndex(self._slots_by_card, variant=self.variant)
+
+    def compact(self):
+        # Moves the last cards into the lowest free slots until there are no gaps left
+        while self._free_slots:
+            if self.slots[-1] is None:
+                self.slots.pop()
+                self._free_slots.remove(len(self.slots))
+                heapq.heapify(self._free_slots)
+                continue
+            before, after = len(self.slots) - 1, heapq.heappop(self._free_slots)
+            card = self.slots.pop()
+            self.slots[after] = card
+            self._slots_by_card[card] = after
+            self.listener.on_card_moved(card, before, after)
+
+
+class Game:
+    STATE_UNSTARTED = 0
+    STATE_STARTED = 1
+    STATE_COMPLETE = 2
+
+    def __init__(self, seed=None, listener=None, variant=STANDARD):
+        self.seed = seed
+        self.variant = variant
+        self.rng = random.Random(seed)
+        self.listener = Listener() if listener is None else listener
+        self.deck = Deck(variant, self.rng, self.listener)
+        self.state = Game.STATE_UNSTARTED
+        self.found_sets = []
+        self.wrong_claims = []
+
+    def start(self):
+        self.state = Game.STATE_STARTED
+        for _ in range(self.variant.board_size):
+            self.deck.draw_card()
+        self.listener.on_game_started()
+        self.populate_play_deck()
+
+    def populate_play_deck(self):
+        while True:
+            if self.deck.num_in_play >= self.variant.board_size:
+                found_set = bool(self.deck.sets)
+                self.listener.on_board_checked(found_set)
+                if found_set:
+                    return
+            if len(self.deck.draw_deck) < self.variant.set_size:
+                self.end()
+                return
+            for _ in range(self.variant.set_size):
+                self.deck.draw_card()
+
+    def find_set(self, player, cards):
+        for card in cards:
+            slot = self.deck.slot(card)
+            self.deck.discard(slot)
+            if self.deck.num_in_play < self.variant.board_size and self.deck.draw_deck:
+                self.deck.draw_card(slot)
+        self.deck.compact()
+        self.found_sets.append(FoundSet(player, cards))
+
+    def claim(self, player, cards):
+        found = self.deck.sets.is_set(cards)
+        self.listener.on_claim(player, cards, found)
+        if not found:
+            self.wrong_claims.append(FoundSet(player, cards))
+            return False
+        self.find_set(player, cards)
+        self.populate_play_deck()
+        return True
+
+    def end(self):
+        self.state = Game.STATE_COMPLETE
+        self.listener.on_game_ended()
+
+    def reset(self, seed=None):
+        # Deals as Game(seed) would; with no seed, the game can't be dealt again
+        self.seed = seed
+        self.rng.seed(seed)
+        self.state = Game.STATE_UNSTARTED
+        self.found_sets = []
+        self.wrong_claims = []
+        self.deck.shuffle()
+
+    def restart(self, seed=None):
+        self.reset(seed)
+        self.start()
+
+
+def play_turn(game, player=None):
+    # Claims a random set from the board
+    game.claim(player, game.rng.choice(list(game.deck.sets)))
+
+
+def play(game, player=None):
+    while game.state == Game.STATE_STARTED:
+        play_turn(game, player)
+    return game
+
+
+def simulate(seed=None, player=None, variant=STANDARD):
+    game = Game(seed, variant=variant)
+    game.start()
+    return play(game, player)
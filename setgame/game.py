@@ -1,36 +1,44 @@
 from .deck import PlayDeck
 from .pile import DiscardPile, DrawPile
 from .clock import Clock
-from .model import FoundSet, GameSummary, is_set, has_set
+from .model import GameSummary, Player, pack
+from . import engine, replay
 
 import hgf
 
 
-class SPGame(hgf.LayeredComponent):
-    STATE_UNSTARTED = 0
-    STATE_STARTED = 1
-    STATE_COMPLETE = 2
+def get_play_deck_size(size):
+    return int(size[0] * 0.6), int(size[1] * 0.7)
 
-    def __init__(self, *args, opacity=0, **kwargs):
+
+class SPGame(engine.Listener, hgf.LayeredComponent):
+    STATE_UNSTARTED = engine.Game.STATE_UNSTARTED
+    STATE_STARTED = engine.Game.STATE_STARTED
+    STATE_COMPLETE = engine.Game.STATE_COMPLETE
+
+    def __init__(self, *args, opacity=0, replay_dir=None, player_name='Player', **kwargs):
         super().__init__(opacity=opacity, *args, **kwargs)
+        # Games are recorded here; not at all if it's None
+        self.replay_dir = replay_dir
+        self.engine = None
         self.play_deck = None
         self.draw_pile = None
         self.discard_pile = None
         self.clock = None
-        self.user = None
-        self.players = None
-        self.game_state = SPGame.STATE_UNSTARTED
-        self.found_sets = []
+        self.user = Player(player_name)
+        self.players = [self.user]
+        self.recorder = None
 
     def on_load(self):
-        self.play_deck = PlayDeck()
+        self.engine = engine.Game(replay.new_seed(), listener=engine.Listeners(self))
+
+        self.play_deck = PlayDeck(self.engine.deck)
         self.register_load(self.play_deck)
 
-        self.draw_pile = DrawPile(len(self.play_deck.draw_deck))
-        self.draw_pile.num_cards = 81
+        self.draw_pile = DrawPile(len(self.engine.deck.draw_deck))
         self.register_load(self.draw_pile)
 
-        self.discard_pile = DiscardPile(len(self.play_deck.discard_deck))
+        self.discard_pile = DiscardPile(len(self.engine.deck.discard_deck))
         self.register_load(self.discard_pile)
 
         self.clock = Clock()
@@ -40,8 +48,11 @@ class SPGame(hgf.LayeredComponent):
 
     def refresh_proportions(self):
         super().refresh_proportions()
-        self.play_deck.size = (int(self.w * 0.6),
-                               int(self.h * 0.7))
+        play_deck_size = get_play_deck_size(self.size)
+        if play_deck_size != self.play_deck.size:
+            self.play_deck.size = play_deck_size
+            # Sizes set while refreshing miss their transition hooks
+            self.play_deck.on_w_transition()
 
         self.draw_pile.size = self.discard_pile.size = (int(self.play_deck.w // 5 * 1.3),
                                                         int(self.play_deck.h // 3.5 * 1.3))
@@ -64,89 +75,107 @@ class SPGame(hgf.LayeredComponent):
     @hgf.double_buffer
     class completed: pass  # TODO: Handle win conditions here
 
-    def find_set(self, player, cards):
-        for card in sorted(cards, key=lambda x: x.index):
-            # Card's index will change when we discard it, so remember the index first
-            index = card.index
-            self.discard(index)
-            if len(self.play_deck._play_deck) < 12 and len(self.play_deck._draw_deck) > 0:
-                self.draw_card(index)
-        self.found_sets.append(FoundSet(player, cards))
-
-    def start(self):
-        # DEBUG ENDGAME
-        # for i in range(69):
-        #     self.deck.draw_card()
-        #     self.deck.discard(0)
-        self.game_state = SPGame.STATE_STARTED
-        for _ in range(12):
-            self.draw_card()
-        self.clock.start()
-        self.populate_play_deck()
+    @property
+    def game_state(self):
+        return self.engine.state
 
-    def populate_play_deck(self):
-        while not has_set(self.play_deck._play_deck) or len(self.play_deck._play_deck) < 12:
-            if len(self.play_deck._draw_deck) < 3:
-                self.end()
-                return
-            for _ in range(3):
-                self.draw_card()
-        self.play_deck.refresh_proportions_flag = True
+    @property
+    def found_sets(self):
+        return self.engine.found_sets
 
-    def on_pause(self):
-        super().on_pause()
-        if self.game_state != SPGame.STATE_COMPLETE:
-            for card in self.play_deck._play_deck:
-                card.is_face_up = False
+    @property
+    def wrong_claims(self):
+        return self.engine.wrong_claims
 
-    def on_unpause(self):
-        super().on_unpause()
-        if self.game_state != SPGame.STATE_COMPLETE:
-            for card in self.play_deck._play_deck:
-                card.is_face_up = True
+    def find_set(self, player, cards):
+        self.engine.find_set(player, [pack(card.values) for card in cards])
 
-    def end(self):
-        self.game_state = SPGame.STATE_COMPLETE
-        self.clock.pause()
-        summary = GameSummary(self)
-        for card in self.play_deck._play_deck:
-            card.discard()
-        for player in self.players:
-            player.end_game(summary)
+    def claim(self, player, cards):
+        return self.engine.claim(player, [pack(card.values) for card in cards])
 
-    def reset(self):
-        self.game_state = SPGame.STATE_UNSTARTED
-        self.found_sets = []
-        self.play_deck.shuffle()
-        self.draw_pile.num_cards = 81
-        self.discard_pile.num_cards = 0
-        self.discard_pile.top_card = None
+    def start(self):
+        # Every game is recorded, so it can be replayed from its seed
+        if self.replay_dir is not None:
+            self.recorder = replay.record(self.replay_dir, self.engine.seed, self.engine.variant)
+            self.engine.listener.listeners.append(self.recorder)
+        self.engine.start()
+
+    def stop_recording(self):
+        if self.recorder is not None:
+            self.engine.listener.listeners.remove(self.recorder)
+            self.recorder.close()
+            self.recorder = None
+
+    def reset(self, seed=None):
+        # A new random game unless given a seed
+        self.stop_recording()
+        self.engine.reset(replay.new_seed() if seed is None else seed)
         self.clock.reset()
 
-    def restart(self):
-        self.reset()
+    def restart(self, seed=None):
+        self.reset(seed)
         self.start()
 
     def add_player(self, player):
         self.players.append(player)
 
-    def draw_card(self, index=None):
+    def on_card_drawn(self, card, index):
         self.draw_pile.num_cards -= 1
-        self.play_deck.draw_card(index)
+        self.play_deck.on_card_drawn(card, index)
 
-    def discard(self, index):
+    def on_card_discarded(self, card, index):
         self.discard_pile.num_cards += 1
-        self.discard_pile.top_card = self.play_deck.discard(index)
+        self.discard_pile.top_card = self.play_deck.get_card(card)
+        self.play_deck.on_card_discarded(card, index)
+
+    def on_card_moved(self, card, before, after):
+        self.play_deck.on_card_moved(card, before, after)
+
+    def on_deck_shuffled(self):
+        self.play_deck.on_deck_shuffled()
+        self.draw_pile.num_cards = len(self.engine.deck.draw_deck)
+        self.discard_pile.num_cards = 0
+        self.discard_pile.top_card = None
+
+    def on_game_started(self):
+        self.clock.start()
+
+    def on_game_ended(self):
+        self.clock.pause()
+        summary = GameSummary(self)
+        for card in self.play_deck.play_deck:
+            card.discard()
+        for player in self.players:
+            player.end_game(summary)
+
+    def on_pause(self):
+        super().on_pause()
+        if self.recorder is not None:
+            self.recorder.pause()
+        if self.game_state != SPGame.STATE_COMPLETE:
+            for card in self.play_deck.play_deck:
+                card.is_face_up = False
+
+    def on_unpause(self):
+        super().on_unpause()
+        if self.recorder is not None:
+            self.recorder.unpause()
+        if self.game_state != SPGame.STATE_COMPLETE:
+            for card in self.play_deck.play_deck:
+                card.is_face_up = True
 
     def handle_message(self, sender, message, **params):
         if message == PlayDeck.MSG_SET_SELECTED:
             selected = params['cards']
-            if is_set(selected):
-                self.find_set(self.user, selected)
-                self.populate_play_deck()
-            else:
+            if not self.claim(self.user, selected):
                 for card in selected:
                     card.toggle_select()
+        elif message == PlayDeck.MSG_CARD_SELECTED:
+            if self.recorder is not None:
+                if params['selected']:
+                    self.recorder.select(params['card'])
+                else:
+                    self.recorder.deselect(params['card'])
         else:
             super().handle_message(sender, message, **params)
 
@@ -157,9 +186,11 @@ class GameHandler(hgf.LayeredComponent):
     MSG_TOGGLE_PAUSE = 'toggle-pause'
     MSG_RESTART = 'restart'
 
-    def __init__(self, opacity=0, **kwargs):
+    def __init__(self, opacity=0, replay_dir=None, player_name='Player', **kwargs):
         super().__init__(opacity=opacity, **kwargs)
         self.context = 'setgame'
+        self.replay_dir = replay_dir
+        self.player_name = player_name
         self.game = None
         self.exit_button = None
         self.pause_button = None
@@ -167,7 +198,7 @@ class GameHandler(hgf.LayeredComponent):
         self.completed_games = []
 
     def on_load(self):
-        self.game = SPGame(z=-1)
+        self.game = self.create_game()
         self.register_load(self.game)
 
         self.exit_button = hgf.LabeledButton('Exit', hgf.Hub.MSG_RETURN_TO_CENTER)
@@ -179,6 +210,9 @@ class GameHandler(hgf.LayeredComponent):
         self.restart_button = hgf.LabeledButton('Restart', GameHandler.MSG_RESTART)
         self.register_load(self.restart_button)
 
+    def create_game(self):
+        return SPGame(z=-1, replay_dir=self.replay_dir, player_name=self.player_name)
+
     def refresh_proportions(self):
         super().refresh_proportions()
         self.game.size = self.size
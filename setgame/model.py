@@ -1,23 +1,64 @@
-# class Game(model.Subject):
-#     def __init__(self):
-#         super().__init__()
-#         self.state_properties = 'started', 'completed', 'time'
-#
-#     def load_hook(self):
-#         self.deck = Deck()
-#         self.register(self.deck)
-#         self.deck.load()
-#
-#         self.clock = hgf.Timer()
-#
-#         self.user = Player('Username')
-#         self.players = [self.user]
-#
-#     @property
-#     def time(self):
-#         return self.clock.time.s
 import itertools
 
+from .stats import PlayerStats, game_record
+
+
+# Cards are packed two bits per attribute, in the order of Card.values.
+_FIELD_BITS = 2
+_FIELD_MASK = 0b11
+_LOW_BITS = 0b01010101
+
+
+def pack(values):
+    code = 0
+    for i, value in enumerate(values):
+        code |= value << (i * _FIELD_BITS)
+    return code
+
+
+def unpack(code):
+    return tuple((code >> (i * _FIELD_BITS)) & _FIELD_MASK for i in range(4))
+
+
+DECK = tuple(pack(values) for values in itertools.product((0, 1, 2), repeat=4))
+
+
+def third(a, b):
+    # Distinct values never share a set bit, so each field of a ^ b is either 0 (equal values, the third card
+    # matches them) or the two values' bits (different values, the third card takes the remaining pattern).
+    x = a ^ b
+    m = ((x | x >> 1) & _LOW_BITS) * _FIELD_MASK
+    return a & ~m | m ^ x
+
+
+# _THIRDS[a][b] is third(a, b) for every pair of cards in the deck
+_THIRDS = [[0] * (1 << 8) for _ in range(1 << 8)]
+for _a in DECK:
+    for _b in DECK:
+        _THIRDS[_a][_b] = third(_a, _b)
+del _a, _b
+
+
+def _codes(cards):
+    return [card if isinstance(card, int) else pack(card.values) for card in cards]
+
+
+def _find_sets(codes, stop_at_first=False):
+    # For each pair there is exactly one card completing a set, so look it up instead of trying every triple.
+    # Cards on a board are distinct, so each set is reported once, with its positions in increasing order.
+    found = []
+    index = {code: k for k, code in enumerate(codes)}
+    n = len(codes)
+    for i in range(n - 2):
+        thirds = _THIRDS[codes[i]]
+        for j in range(i + 1, n - 1):
+            k = index.get(thirds[codes[j]])
+            if k is not None and k > j:
+                found.append((i, j, k))
+                if stop_at_first:
+                    return found
+    return found
+
 
 def is_match(values):
     return len(values) == 3 and sum(values) % 3 == 0
@@ -28,11 +69,184 @@ def is_set(cards):
 
 
 def has_set(cards):
-    return any(is_set(sub) for sub in itertools.combinations(cards, 3))
+    return bool(_find_sets(_codes(cards), stop_at_first=True))
+
+
+def count_sets(cards):
+    return len(_find_sets(_codes(cards)))
 
 
 def all_sets(cards):
-    return list(filter(is_set, itertools.combinations(cards, 3)))
+    cards = list(cards)
+    return [(cards[i], cards[j], cards[k]) for i, j, k in _find_sets(_codes(cards))]
+
+
+class Variant:
+    # A deck of values ** attributes cards, where a set is one card of each value or all the same value
+    # in every attribute, so a set has as many cards as there are values.
+    def __init__(self, attributes=4, values=3, board_size=None):
+        if values < 3:
+            raise ValueError('A variant needs at least 3 values per attribute, not {}'.format(values))
+        self.attributes = attributes
+        self.values = values
+        self.set_size = values
+        self.board_size = attributes * values if board_size is None else board_size
+
+        self._field_bits = (values - 1).bit_length()
+        self._field_mask = (1 << self._field_bits) - 1
+        self._low_bits = sum(1 << (i * self._field_bits) for i in range(attributes))
+        self._value_sum = values * (values - 1) // 2
+        self._is_standard = (attributes, values) == (4, 3)
+
+        self.cards = tuple(self.pack(v) for v in itertools.product(range(values), repeat=attributes))
+
+    def pack(self, values):
+        code = 0
+        for i, value in enumerate(values):
+            code |= value << (i * self._field_bits)
+        return code
+
+    def unpack(self, code):
+        return tuple((code >> (i * self._field_bits)) & self._field_mask for i in range(self.attributes))
+
+    def complete(self, cards):
+        # The card completing a set with the given set_size - 1 cards, or None if there is none
+        if self.values == 3:
+            a, b = cards
+            x = a ^ b
+            m = ((x | x >> 1) & self._low_bits) * self._field_mask
+            return a & ~m | m ^ x
+        code = 0
+        for shift in range(0, self.attributes * self._field_bits, self._field_bits):
+            values = {card >> shift & self._field_mask for card in cards}
+            if len(values) == 1:
+                value = values.pop()
+            elif len(values) == len(cards):
+                value = self._value_sum - sum(values)
+            else:
+                return None
+            code |= value << shift
+        return code
+
+    def _codes(self, cards):
+        return [card if isinstance(card, int) else self.pack(card.values) for card in cards]
+
+    def _find_sets(self, codes, stop_at_first=False):
+        if self._is_standard:
+            return _find_sets(codes, stop_at_first)
+        found = []
+        index = {code: k for k, code in enumerate(codes)}
+        if self.values == 3:
+            low_bits, field_mask = self._low_bits, self._field_mask
+            for i in range(len(codes) - 2):
+                a = codes[i]
+                for j in range(i + 1, len(codes) - 1):
+                    x = a ^ codes[j]
+                    m = ((x | x >> 1) & low_bits) * field_mask
+                    k = index.get(a & ~m | m ^ x)
+                    if k is not None and k > j:
+                        found.append((i, j, k))
+                        if stop_at_first:
+                            return found
+            return found
+        for others in itertools.combinations(range(len(codes)), self.set_size - 1):
+            k = index.get(self.complete([codes[i] for i in others]))
+            if k is not None and k > others[-1]:
+                found.append(others + (k,))
+                if stop_at_first:
+                    return found
+        return found
+
+    def sets_with(self, card, cards):
+        # Sets among cards and card that include card, each listed once with card last
+        found = []
+        if self._is_standard:
+            thirds = _THIRDS[card]
+            for other in cards:
+                third = thirds[other]
+                if other < third and third in cards:
+                    found.append((other, third, card))
+        elif self.values == 3:
+            for other in cards:
+                third = self.complete((other, card))
+                if other < third and third in cards:
+                    found.append((other, third, card))
+        else:
+            for others in itertools.combinations(sorted(cards), self.set_size - 2):
+                last = self.complete(others + (card,))
+                if last is not None and last > others[-1] and last in cards:
+                    found.append(others + (last, card))
+        return found
+
+    def is_set(self, cards):
+        codes = self._codes(cards)
+        return len(codes) == self.set_size and self.complete(codes[:-1]) == codes[-1]
+
+    def attribute_matches(self, cards):
+        # For each attribute, whether the cards are all the same or all different in it
+        codes = self._codes(cards)
+        matches = []
+        for shift in range(0, self.attributes * self._field_bits, self._field_bits):
+            values = {code >> shift & self._field_mask for code in codes}
+            matches.append(len(values) == 1 or len(values) == len(codes) == self.set_size)
+        return matches
+
+    def has_set(self, cards):
+        return bool(self._find_sets(self._codes(cards), stop_at_first=True))
+
+    def count_sets(self, cards):
+        return len(self._find_sets(self._codes(cards)))
+
+    def all_sets(self, cards):
+        cards = list(cards)
+        return [tuple(cards[i] for i in found) for found in self._find_sets(self._codes(cards))]
+
+    def __repr__(self):
+        return 'Variant(attributes={}, values={}, board_size={})'.format(self.attributes, self.values,
+                                                                         self.board_size)
+
+
+STANDARD = Variant()
+
+
+class SetIndex:
+    # Live index of the sets among a changing collection of packed cards
+    def __init__(self, cards=(), variant=STANDARD):
+        self.variant = variant
+        self._cards = set()
+        self._sets = {}
+        self._sets_by_card = {}
+        for card in cards:
+            self.add(card)
+
+    def add(self, card):
+        self._sets_by_card[card] = set()
+        for cards in self.variant.sets_with(card, self._cards):
+            key = frozenset(cards)
+            self._sets[key] = cards
+            for other in cards:
+                self._sets_by_card[other].add(key)
+        self._cards.add(card)
+
+    def remove(self, card):
+        self._cards.remove(card)
+        for key in self._sets_by_card.pop(card):
+            del self._sets[key]
+            for other in key:
+                if other != card:
+                    self._sets_by_card[other].discard(key)
+
+    def is_set(self, cards):
+        return frozenset(cards) in self._sets
+
+    def __bool__(self):
+        return bool(self._sets)
+
+    def __len__(self):
+        return len(self._sets)
+
+    def __iter__(self):
+        return iter(self._sets.values())
 
 
 class FoundSet:
@@ -42,21 +256,24 @@ class FoundSet:
 
 
 class PlayerSummary:
-    def __init__(self, player, found_sets):
+    def __init__(self, player, found_sets, wrong_claims=()):
         self.name = player.name
         self.found_sets = found_sets
+        self.wrong_claims = list(wrong_claims)
         self.won = False
 
 
 class GameSummary:
     def __init__(self, game):
         self.time = game.clock.time
+        self.variant = game.engine.variant
         self.found_sets = game.found_sets
         self.players = []
         for player in game.players:
             found_sets = list(filter(lambda y: y.player is player, self.found_sets))
-            self.players.append(PlayerSummary(player, found_sets))
-        self.players.sort(key=lambda x: len(x.found_sets))
+            wrong_claims = list(filter(lambda y: y.player is player, game.wrong_claims))
+            self.players.append(PlayerSummary(player, found_sets, wrong_claims))
+        self.players.sort(key=lambda x: len(x.found_sets), reverse=True)
         self.winner = self.players[0]
         self.winner.won = True
 
@@ -67,9 +284,11 @@ class GameSummary:
 class Player:
     def __init__(self, name):
         self.name = name
-        self.won_games = []
+        self.stats = PlayerStats()
 
     def end_game(self, summary):
+        for player_summary in summary.players:
+            if player_summary.name == self.name:
+                self.stats.add(game_record(summary, player_summary))
         if summary.winner.name == self.name:
-            self.won_games.append(summary)
             print(summary)
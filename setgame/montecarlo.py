@@ -0,0 +1,144 @@
+import argparse
+import collections
+import json
+import multiprocessing
+import sys
+
+from . import engine
+from .model import Variant
+
+
+SHARD_SIZE = 1000
+
+
+class DealStats(engine.Listener):
+    def __init__(self):
+        self.games = 0
+        self.boards = 0
+        self.no_set_boards = 0
+        self.board_sizes = collections.Counter()
+        self.max_board_sizes = collections.Counter()
+        self.cards_left = collections.Counter()
+        self.sets_per_game = collections.Counter()
+        self._game = None
+        self._max_board_size = 0
+
+    def on_board_checked(self, found_set):
+        self.boards += 1
+        if not found_set:
+            self.no_set_boards += 1
+
+    def on_card_drawn(self, card, index):
+        self._max_board_size = max(self._max_board_size, self._game.deck.num_in_play)
+
+    def play(self, seed, variant):
+        self._max_board_size = 0
+        self._game = game = engine.Game(seed, listener=self, variant=variant)
+        game.start()
+        while game.state == engine.Game.STATE_STARTED:
+            self.board_sizes[game.deck.num_in_play] += 1
+            engine.play_turn(game)
+        self.games += 1
+        self.max_board_sizes[self._max_board_size] += 1
+        self.cards_left[game.deck.num_in_play] += 1
+        self.sets_per_game[len(game.found_sets)] += 1
+        self._game = None
+
+    def merge(self, other):
+        self.games += other.games
+        self.boards += other.boards
+        self.no_set_boards += other.no_set_boards
+        self.board_sizes += other.board_sizes
+        self.max_board_sizes += other.max_board_sizes
+        self.cards_left += other.cards_left
+        self.sets_per_game += other.sets_per_game
+        return self
+
+    def as_dict(self):
+        return {
+            'games': self.games,
+            'boards': self.boards,
+            'no_set_boards': self.no_set_boards,
+            'no_set_rate': self.no_set_boards / self.boards if self.boards else 0.0,
+            'board_sizes': dict(sorted(self.board_sizes.items())),
+            'max_board_sizes': dict(sorted(self.max_board_sizes.items())),
+            'cards_left': dict(sorted(self.cards_left.items())),
+            'sets_per_game': dict(sorted(self.sets_per_game.items())),
+        }
+
+    def __str__(self):
+        def dist(counter, total):
+            return ', '.join('{}: {:.2%}'.format(k, v / total) for k, v in sorted(counter.items()))
+
+        return '\n'.join([
+            '{} games, {} boards checked, {:.3%} with no set'.format(
+                self.games, self.boards, self.no_set_boards / self.boards if self.boards else 0.0),
+            'board sizes:     ' + dist(self.board_sizes, sum(self.board_sizes.values())),
+            'max board sizes: ' + dist(self.max_board_sizes, self.games),
+            'cards left:      ' + dist(self.cards_left, self.games),
+            'sets per game:   ' + dist(self.sets_per_game, self.games),
+        ])
+
+
+def game_seed(seed, index):
+    # Seeds depend only on the game's index, so results do not depend on how games are sharded
+    return '{}:{}'.format(seed, index)
+
+
+def run_shard(args):
+    seed, start, stop, variant = args
+    stats = DealStats()
+    for index in range(start, stop):
+        stats.play(game_seed(seed, index), variant)
+    return stats
+
+
+def shards(games, seed=0, shard_size=SHARD_SIZE, variant=None):
+    variant = Variant() if variant is None else variant
+    return [(seed, start, min(start + shard_size, games), variant) for start in range(0, games, shard_size)]
+
+
+def stream(games, seed=0, workers=None, shard_size=SHARD_SIZE, variant=None):
+    # Yields the running totals after each shard completes; the final totals are the same for any worker count
+    total = DealStats()
+    jobs = shards(games, seed, shard_size, variant)
+    if workers == 1:
+        for stats in map(run_shard, jobs):
+            yield total.merge(stats)
+        return
+    with multiprocessing.Pool(workers) as pool:
+        for stats in pool.imap_unordered(run_shard, jobs):
+            yield total.merge(stats)
+
+
+def run(games, seed=0, workers=None, shard_size=SHARD_SIZE, variant=None):
+    total = DealStats()
+    for total in stream(games, seed, workers, shard_size, variant):
+        pass
+    return total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Simulate games of Set and report deal statistics.')
+    parser.add_argument('games', type=int)
+    parser.add_argument('--seed', default='0')
+    parser.add_argument('--workers', type=int, default=None, help='processes to use (default: all cores)')
+    parser.add_argument('--shard-size', type=int, default=SHARD_SIZE)
+    parser.add_argument('--attributes', type=int, default=4)
+    parser.add_argument('--values', type=int, default=3)
+    parser.add_argument('--board-size', type=int, default=None)
+    parser.add_argument('--json', action='store_true', help='print the final statistics as JSON')
+    parser.add_argument('--quiet', action='store_true', help='do not report progress')
+    args = parser.parse_args(argv)
+
+    variant = Variant(args.attributes, args.values, args.board_size)
+    total = DealStats()
+    for total in stream(args.games, args.seed, args.workers, args.shard_size, variant):
+        if not args.quiet:
+            print('{}/{} games'.format(total.games, args.games), file=sys.stderr)
+
+    print(json.dumps(total.as_dict(), indent=2) if args.json else total)
+
+
+if __name__ == '__main__':
+    main()
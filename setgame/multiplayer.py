@@ -0,0 +1,151 @@
+import collections
+
+from .client import ThreadedClient
+from .deck import PlayDeck
+from .game import GameHandler, SPGame
+from .model import Player, pack
+
+
+ROOM = 'lobby'
+
+
+class MPGame(SPGame):
+    # A game played in a room on a server. The server holds the real game; this one is dealt from the room's
+    # seed and replays every claim the server resolves, in the server's order. The server's board deltas are
+    # checked against the ones the rules make here, and a mismatch joins the room again to catch up.
+    def __init__(self, client, room, name, **kwargs):
+        super().__init__(player_name=name, **kwargs)
+        self.client = client
+        self.room = room
+        self.name = name
+        self.player_id = None
+        self.players_by_id = {}
+        # Player id -> the cards they have selected
+        self.selections = {}
+        # Board deltas made here that the server hasn't confirmed yet; None while joining again
+        self._deltas = collections.deque()
+
+    def on_load(self):
+        super().on_load()
+        self.client.join(self.room, self.name)
+
+    def get_player(self, id_, name=None):
+        player = self.players_by_id.get(id_)
+        if player is None:
+            player = self.players_by_id[id_] = Player(name or 'Player {}'.format(id_))
+            self.players.append(player)
+        return player
+
+    def start(self):
+        # Nothing is dealt until the server says which game the room is playing
+        if self.player_id is not None:
+            super().start()
+
+    def restart(self, seed=None):
+        # The room picks the seed
+        self.client.restart()
+
+    def deal(self, seed, claims):
+        self.stop_recording()
+        self.engine.reset(seed)
+        self.clock.reset()
+        super().start()
+        for id_, cards, found in claims:
+            self.engine.claim(self.get_player(id_), cards)
+
+    def on_card_drawn(self, card, index):
+        super().on_card_drawn(card, index)
+        if self._deltas is not None:
+            self._deltas.append({'type': 'drawn', 'slot': index, 'card': card})
+
+    def on_card_discarded(self, card, index):
+        super().on_card_discarded(card, index)
+        if self._deltas is not None:
+            self._deltas.append({'type': 'discarded', 'slot': index})
+
+    def on_card_moved(self, card, before, after):
+        super().on_card_moved(card, before, after)
+        if self._deltas is not None:
+            self._deltas.append({'type': 'moved', 'before': before, 'after': after})
+
+    def _deselect(self, cards):
+        for code in cards:
+            card = self.play_deck.get_card(code)
+            if card.is_selected:
+                card.toggle_select()
+
+    def on_tick(self, elapsed):
+        super().on_tick(elapsed)
+        for message in self.client.poll():
+            self.handle_server_message(message)
+
+    def handle_server_message(self, message):
+        kind = message['type']
+        if kind == 'joined':
+            self.player_id = message['player']
+            self.players = []
+            self.players_by_id = {}
+            for id_, name in message['players'].items():
+                self.get_player(id_, name)
+            self.user = self.get_player(self.player_id)
+            self.deal(message['seed'], message['claims'])
+            # The server only sends deltas from here on
+            self._deltas = collections.deque()
+        elif kind == 'entered':
+            self.get_player(message['player'], message['name'])
+        elif kind == 'left':
+            self.selections.pop(message['player'], None)
+        elif kind == 'selected':
+            self.selections[message['player']] = message['cards']
+        elif self._deltas is None:
+            # Out of step with the server until it answers the join
+            pass
+        elif kind in ('claimed', 'new-game') and self._deltas:
+            # Deltas made here that the server never sent
+            self.resync()
+        elif kind == 'claimed':
+            found = self.engine.claim(self.get_player(message['player']), message['cards'])
+            if not found and message['player'] == self.player_id:
+                self._deselect(message['cards'])
+        elif kind == 'stale':
+            self._deselect(message['cards'])
+        elif kind == 'new-game':
+            self.selections.clear()
+            self._deltas.clear()
+            self.deal(message['seed'], [])
+        elif kind in ('drawn', 'discarded', 'moved'):
+            if not self._deltas or self._deltas.popleft() != message:
+                self.resync()
+
+    def resync(self):
+        # Joining again brings the room's seed and claims, to deal the game again from
+        self._deltas = None
+        self.client.join(self.room, self.name)
+
+    def handle_message(self, sender, message, **params):
+        if message == PlayDeck.MSG_SET_SELECTED:
+            self.client.claim(pack(card.values) for card in params['cards'])
+        elif message == PlayDeck.MSG_CARD_SELECTED:
+            super().handle_message(sender, message, **params)
+            self.client.select(pack(card.values) for card in self.play_deck.get_selected())
+        else:
+            super().handle_message(sender, message, **params)
+
+
+class MPGameHandler(GameHandler):
+    def __init__(self, address, name, room=ROOM, **kwargs):
+        super().__init__(**kwargs)
+        self.client = ThreadedClient()
+        try:
+            self.client.connect(*address)
+        except Exception:
+            self.client.close()
+            raise
+        self.room = room
+        self.name = name
+
+    def close(self):
+        self.client.close()
+
+    def create_game(self):
+        return MPGame(self.client, self.room, self.name, z=-1, replay_dir=self.replay_dir)
@@ -0,0 +1,189 @@
+import asyncio
+import time
+
+from . import protocol
+
+
+# Users a connection can have news waiting for before more news drops it
+MAX_PENDING = 256
+# Bytes a connection can have buffered before the hub holds its updates back
+HIGH_WATER = 1 << 16
+# Seconds a connection can be held back before it's dropped as too slow
+STALL_TIMEOUT = 10
+
+
+def call_later(delay, callback):
+    # On the running event loop after delay seconds, or on its next pass for none, so whatever else is published
+    # before then goes out with it. Returns whether there was a loop to schedule it on.
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    if delay:
+        loop.call_later(delay, callback)
+    else:
+        loop.call_soon(callback)
+    return True
+
+
+class _Entry:
+    # A user's latest presence, encoded once per change: in full, and as the changes from the version before
+    __slots__ = ('version', 'fields', 'full', 'delta')
+
+    def __init__(self, version, fields, full, delta):
+        self.version = version
+        self.fields = fields
+        self.full = full
+        self.delta = delta
+
+
+class Subscription:
+    # A connection's place in the hub: the users it follows, the version of each it was last sent, and the
+    # users with news for it in the order the news came. News for a user already waiting merges into it.
+    def __init__(self, connection):
+        self.connection = connection
+        self.users = set()
+        self.sent = {}
+        self.pending = {}
+        self.held_since = None
+
+
+class PresenceHub:
+    # Fans presence out from users to the connections following them. A connection is anything with
+    # send(data) taking one encoded message, buffered() giving the bytes it hasn't written yet, and close().
+    # Nothing is sent until flush(). schedule(delay, callback), e.g. call_later, is asked to flush when there is
+    # news, and again when a connection held back would have stalled, and returns whether it could; without
+    # it, the owner flushes, once a tick say, which drops stalled connections too. Each connection is sent the
+    # encoded changes if it has the version before, and the user's whole presence if it missed some.
+    def __init__(self, schedule=None, max_pending=MAX_PENDING, high_water=HIGH_WATER,
+                 stall_timeout=STALL_TIMEOUT, clock=time.monotonic):
+        self.schedule = schedule
+        self.max_pending = max_pending
+        self.high_water = high_water
+        self.stall_timeout = stall_timeout
+        self.clock = clock
+        self.published = 0
+        self.sent = 0
+        self.dropped = 0
+        self._entries = {}
+        # User id -> the subscriptions following them
+        self._followers = {}
+        self._subscriptions = {}
+        self._waiting = set()
+        self._scheduled = False
+        self._stall_check = False
+
+    def subscribe(self, connection, user_ids):
+        subscription = self._subscriptions.get(connection)
+        if subscription is None:
+            subscription = self._subscriptions[connection] = Subscription(connection)
+        for user_id in user_ids:
+            if user_id in subscription.users:
+                continue
+            subscription.users.add(user_id)
+            self._followers.setdefault(user_id, set()).add(subscription)
+            if user_id in self._entries:
+                self._queue(subscription, user_id)
+        self._schedule()
+
+    def unsubscribe(self, connection, user_ids=None):
+        # From every user if user_ids is None
+        subscription = self._subscriptions.get(connection)
+        if subscription is None:
+            return
+        for user_id in list(subscription.users) if user_ids is None else user_ids:
+            subscription.users.discard(user_id)
+            subscription.sent.pop(user_id, None)
+            subscription.pending.pop(user_id, None)
+            followers = self._followers.get(user_id)
+            if followers is not None:
+                followers.discard(subscription)
+                if not followers:
+                    del self._followers[user_id]
+        if not subscription.users:
+            del self._subscriptions[connection]
+            self._waiting.discard(subscription)
+
+    def publish(self, public_data):
+        # Returns whether anything changed
+        fields = {field: list(value) if isinstance(value, list) else value
+                  for field, value in protocol.public_fields(public_data).items()}
+        entry = self._entries.get(public_data.id)
+        changes = protocol.presence_changes(entry and entry.fields, fields)
+        if not changes:
+            return False
+        full = protocol.encode({'type': 'presence', 'user': public_data.id, 'changes': fields})
+        if entry is None:
+            entry = self._entries[public_data.id] = _Entry(1, fields, full, full)
+        else:
+            entry.version += 1
+            entry.fields = fields
+            entry.full = full
+            entry.delta = protocol.encode({'type': 'presence', 'user': public_data.id, 'changes': changes})
+        self.published += 1
+        for subscription in list(self._followers.get(public_data.id, ())):
+            self._queue(subscription, public_data.id)
+            if len(subscription.pending) > self.max_pending:
+                self.drop(subscription.connection)
+        self._schedule()
+        return True
+
+    def _queue(self, subscription, user_id):
+        subscription.pending[user_id] = None
+        self._waiting.add(subscription)
+
+    def _schedule(self):
+        if self.schedule is not None and self._waiting and not self._scheduled:
+            self._scheduled = self.schedule(0, self.flush)
+
+    def _schedule_stall_check(self, delay):
+        # A flush when the connection held back longest would have stalled, whether or not there's news by then
+        if self.schedule is not None and not self._stall_check:
+            self._stall_check = self.schedule(delay, self._check_stalls)
+
+    def _check_stalls(self):
+        self._stall_check = False
+        self.flush()
+
+    def flush(self):
+        self._scheduled = False
+        now = self.clock()
+        held_since = None
+        for subscription in list(self._waiting):
+            connection = subscription.connection
+            if connection.buffered() > self.high_water:
+                # Held back until a later flush finds it caught up; meanwhile its news keeps merging
+                if subscription.held_since is None:
+                    subscription.held_since = now
+                elif now - subscription.held_since >= self.stall_timeout:
+                    self.drop(connection)
+                    continue
+                if held_since is None or subscription.held_since < held_since:
+                    held_since = subscription.held_since
+                continue
+            subscription.held_since = None
+            self._waiting.discard(subscription)
+            pending, subscription.pending = subscription.pending, {}
+            for user_id in pending:
+                entry = self._entries.get(user_id)
+                if entry is None:
+                    continue
+                data = entry.delta if subscription.sent.get(user_id) == entry.version - 1 else entry.full
+                subscription.sent[user_id] = entry.version
+                connection.send(data)
+                self.sent += 1
+        if held_since is not None:
+            self._schedule_stall_check(held_since + self.stall_timeout - now)
+
+    def resume(self, connection):
+        # For a connection to call once it has written what it buffered, so news held back for it goes out
+        self._schedule()
+
+    def drop(self, connection):
+        self.unsubscribe(connection)
+        self.dropped += 1
+        connection.close()
+
+
+# The hub User uses by default. It flushes itself on a running event loop; code publishing without one flushes it.
+HUB = PresenceHub(schedule=call_later)
@@ -0,0 +1,128 @@
+import collections
+import functools
+import json
+import os
+import time
+
+import pygame
+
+
+# The hgf hooks the game's components override
+HOOKS = 'refresh_background', 'refresh_proportions', 'refresh_layout', 'handle_message'
+
+# Frames the overlay averages over, and the most calls kept for a trace
+WINDOW = 120
+MAX_EVENTS = 500000
+
+
+class FrameProfiler:
+    # Times calls to component hooks and groups them by frame. Times are inclusive, so a handle_message that
+    # passes the message on to its parent includes the parent's handle_message.
+    def __init__(self, window=WINDOW, max_events=MAX_EVENTS):
+        # (frame time, {(component, hook): [calls, time]}) for the latest frames
+        self.frames = collections.deque(maxlen=window)
+        # (name, category, start, duration) of every call and frame, oldest dropped first
+        self.events = collections.deque(maxlen=max_events)
+        self._calls = collections.defaultdict(lambda: [0, 0])
+        self._start = self._frame_start = time.perf_counter()
+        self._originals = []
+
+    def instrument(self, *classes, hooks=HOOKS):
+        for cls in classes:
+            for hook in hooks:
+                self._originals.append((cls, hook, cls.__dict__.get(hook)))
+                setattr(cls, hook, self._timed(hook, getattr(cls, hook)))
+
+    def uninstrument(self):
+        for cls, hook, original in reversed(self._originals):
+            if original is None:
+                delattr(cls, hook)
+            else:
+                setattr(cls, hook, original)
+        self._originals.clear()
+
+    def _timed(self, hook, method):
+        @functools.wraps(method)
+        def timed(component, *args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(component, *args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                name = type(component).__name__
+                calls = self._calls[name, hook]
+                calls[0] += 1
+                calls[1] += elapsed
+                self.events.append(('{}.{}'.format(name, hook), hook, start, elapsed))
+        return timed
+
+    def end_frame(self):
+        now = time.perf_counter()
+        self.frames.append((now - self._frame_start, dict(self._calls)))
+        self.events.append(('frame', 'frame', self._frame_start, now - self._frame_start))
+        self._calls.clear()
+        self._frame_start = now
+
+    def summary(self):
+        # [(component, hook, calls/frame, ms/frame, worst ms in a frame)], most expensive first
+        frames = len(self.frames) or 1
+        totals = collections.defaultdict(lambda: [0, 0, 0])
+        for _, calls in self.frames:
+            for key, (count, elapsed) in calls.items():
+                total = totals[key]
+                total[0] += count
+                total[1] += elapsed
+                total[2] = max(total[2], elapsed)
+        rows = [(name, hook, count / frames, elapsed * 1000 / frames, worst * 1000)
+                for (name, hook), (count, elapsed, worst) in totals.items()]
+        return sorted(rows, key=lambda row: row[3], reverse=True)
+
+    @property
+    def frame_time(self):
+        return sum(elapsed for elapsed, _ in self.frames) / (len(self.frames) or 1)
+
+    def write_trace(self, filename):
+        # Chrome's trace event format, for chrome://tracing or Perfetto
+        pid = os.getpid()
+        events = [{'name': name, 'cat': category, 'ph': 'X', 'pid': pid, 'tid': 0,
+                   'ts': (start - self._start) * 1e6, 'dur': elapsed * 1e6}
+                  for name, category, start, elapsed in self.events]
+        with open(filename, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+
+class ProfilerOverlay:
+    # The profiler's summary as a translucent table, redrawn every REFRESH_TIME seconds
+    ROWS = 12
+    LINE_HEIGHT = 18
+    COLUMNS = 0, 260, 340, 420
+    WIDTH = 500
+    REFRESH_TIME = 0.5
+
+    def __init__(self, profiler, font, pos=(8, 8)):
+        self.profiler = profiler
+        self.font = font
+        height = (ProfilerOverlay.ROWS + 1) * ProfilerOverlay.LINE_HEIGHT + 8
+        self.rect = pygame.Rect(pos, (ProfilerOverlay.WIDTH, height))
+        self._surface = None
+        self._rendered = 0
+
+    def render(self):
+        now = time.perf_counter()
+        if self._surface is not None and now - self._rendered < ProfilerOverlay.REFRESH_TIME:
+            return self._surface
+        self._rendered = now
+
+        surf = pygame.Surface(self.rect.size, pygame.SRCALPHA)
+        surf.fill((0, 0, 0, 180))
+
+        rows = [('{:.2f} ms/frame'.format(self.profiler.frame_time * 1000), 'calls', 'ms', 'worst')]
+        rows += [('{}.{}'.format(name, hook), '{:.1f}'.format(calls), '{:.2f}'.format(ms), '{:.2f}'.format(worst))
+                 for name, hook, calls, ms, worst in self.profiler.summary()[:ProfilerOverlay.ROWS]]
+        for i, row in enumerate(rows):
+            y = 4 + i * ProfilerOverlay.LINE_HEIGHT
+            for x, cell in zip(ProfilerOverlay.COLUMNS, row):
+                self.font.render_to(surf, (x + 6, y), cell, fgcolor=(255, 255, 255), size=14)
+
+        self._surface = surf
+        return surf
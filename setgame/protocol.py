@@ -0,0 +1,289 @@
+import asyncio
+import struct
+
+
+# Messages are dicts with a 'type' and the fields listed for it below. On the wire each is a byte for its type
+# followed by its fields, and a connection carries frames: a varint length, then messages back to back. The
+# server batches everything it has for a connection in one pass of the event loop into one frame.
+#
+# Field types:
+#   uint      varint
+#   bool      one byte
+#   str       varint length, then UTF-8
+#   ostr      a str that may be None: varint length + 1, or 0 for None
+#   seed      8 bytes, little-endian
+#   time      seconds, as a varint of microseconds
+#   cards     varint count, then a byte per card, packed as in model.Variant
+#   variant   attributes, values, board size, as uints
+#   players   varint count, then (uint id, str name) pairs
+#   claims    varint count, then (uint player, cards, bool found) triples
+#   strs      varint count, then each as a str; uints likewise
+#   changes   a byte marking which of PRESENCE_FIELDS follow, then each of them
+MESSAGES = {
+    # Client to server
+    'join': (1, (('room', 'str'), ('name', 'str'))),
+    'leave': (2, ()),
+    'select': (3, (('cards', 'cards'),)),
+    'claim': (4, (('cards', 'cards'),)),
+    'restart': (5, ()),
+
+    # Server to client. claims in 'joined' are the current game's so far, which a client replays through the
+    # rules to catch up; time in 'claimed' is when the server received the claim, in seconds into the game.
+    'joined': (16, (('room', 'str'), ('player', 'uint'), ('seed', 'seed'), ('variant', 'variant'),
+                    ('players', 'players'), ('claims', 'claims'))),
+    'entered': (17, (('player', 'uint'), ('name', 'str'))),
+    'left': (18, (('player', 'uint'),)),
+    'selected': (19, (('player', 'uint'), ('cards', 'cards'))),
+    'claimed': (20, (('player', 'uint'), ('cards', 'cards'), ('found', 'bool'), ('time', 'time'))),
+    'stale': (21, (('cards', 'cards'),)),
+    'new-game': (22, (('seed', 'seed'),)),
+    'error': (23, (('reason', 'str'),)),
+
+    # Board deltas, following the claim or new game that caused them
+    'drawn': (24, (('slot', 'uint'), ('card', 'uint'))),
+    'discarded': (25, (('slot', 'uint'),)),
+    'moved': (26, (('before', 'uint'), ('after', 'uint'))),
+
+    # The fields of a user's PublicData that changed
+    'presence': (27, (('user', 'uint'), ('changes', 'changes'))),
+}
+
+_TYPES = {code: (name, fields) for name, (code, fields) in MESSAGES.items()}
+
+# (field, type) of PublicData, in the order of their bits in a presence change
+PRESENCE_FIELDS = (('name', 'str'), ('address', 'ostr'), ('common_addresses', 'strs'), ('friends', 'uints'),
+                   ('version', 'uint'))
+
+MAX_FRAME = 1 << 16
+
+_SEED = struct.Struct('<Q')
+
+
+def _write_uint(buf, n):
+    if n < 0:
+        raise ValueError('Can\'t encode {} as a varint'.format(n))
+    while n >= 0x80:
+        buf.append(n & 0x7f | 0x80)
+        n >>= 7
+    buf.append(n)
+
+
+def _write_str(buf, s):
+    data = s.encode()
+    _write_uint(buf, len(data))
+    buf += data
+
+
+def _write_cards(buf, cards):
+    cards = bytes(cards)
+    _write_uint(buf, len(cards))
+    buf += cards
+
+
+def _write(buf, kind, value):
+    if kind == 'uint':
+        _write_uint(buf, value)
+    elif kind == 'bool':
+        buf.append(bool(value))
+    elif kind == 'str':
+        _write_str(buf, value)
+    elif kind == 'ostr':
+        if value is None:
+            buf.append(0)
+        else:
+            data = value.encode()
+            _write_uint(buf, len(data) + 1)
+            buf += data
+    elif kind == 'seed':
+        buf += _SEED.pack(value)
+    elif kind == 'time':
+        _write_uint(buf, round(value * 1e6))
+    elif kind == 'cards':
+        _write_cards(buf, value)
+    elif kind == 'variant':
+        for n in value:
+            _write_uint(buf, n)
+    elif kind == 'players':
+        _write_uint(buf, len(value))
+        for id_, name in value.items():
+            _write_uint(buf, id_)
+            _write_str(buf, name)
+    elif kind == 'claims':
+        _write_uint(buf, len(value))
+        for player, cards, found in value:
+            _write_uint(buf, player)
+            _write_cards(buf, cards)
+            buf.append(bool(found))
+    elif kind == 'strs' or kind == 'uints':
+        _write_uint(buf, len(value))
+        for item in value:
+            _write(buf, kind[:-1], item)
+    elif kind == 'changes':
+        fields = [(field, field_kind) for field, field_kind in PRESENCE_FIELDS if field in value]
+        buf.append(sum(1 << i for i, (field, _) in enumerate(PRESENCE_FIELDS) if field in value))
+        for field, field_kind in fields:
+            _write(buf, field_kind, value[field])
+    else:
+        raise ValueError('Unknown field type {}'.format(kind))
+
+
+class _Reader:
+    def __init__(self, data):
+        self.data = data
+        self.i = 0
+
+    def byte(self):
+        byte = self.data[self.i]
+        self.i += 1
+        return byte
+
+    def take(self, n):
+        if self.i + n > len(self.data):
+            raise ValueError('Message cut short')
+        data = self.data[self.i:self.i + n]
+        self.i += n
+        return data
+
+    def uint(self):
+        n = shift = 0
+        while True:
+            byte = self.byte()
+            n |= (byte & 0x7f) << shift
+            if byte < 0x80:
+                return n
+            shift += 7
+            # No field needs more than 64 bits
+            if shift >= 70:
+                raise ValueError('Varint too long')
+
+    def str(self):
+        return bytes(self.take(self.uint())).decode()
+
+    def cards(self):
+        return list(self.take(self.uint()))
+
+    def read(self, kind):
+        if kind == 'uint':
+            return self.uint()
+        elif kind == 'bool':
+            return bool(self.byte())
+        elif kind == 'str':
+            return self.str()
+        elif kind == 'ostr':
+            n = self.uint()
+            return bytes(self.take(n - 1)).decode() if n else None
+        elif kind == 'seed':
+            return _SEED.unpack(self.take(8))[0]
+        elif kind == 'time':
+            return self.uint() / 1e6
+        elif kind == 'cards':
+            return self.cards()
+        elif kind == 'variant':
+            return [self.uint(), self.uint(), self.uint()]
+        elif kind == 'players':
+            return {self.uint(): self.str() for _ in range(self.uint())}
+        elif kind == 'claims':
+            return [[self.uint(), self.cards(), bool(self.byte())] for _ in range(self.uint())]
+        elif kind == 'strs' or kind == 'uints':
+            return [self.read(kind[:-1]) for _ in range(self.uint())]
+        elif kind == 'changes':
+            mask = self.byte()
+            return {field: self.read(field_kind) for i, (field, field_kind) in enumerate(PRESENCE_FIELDS)
+                    if mask & 1 << i}
+        raise ValueError('Unknown field type {}'.format(kind))
+
+
+def encode(message):
+    code, fields = MESSAGES[message['type']]
+    buf = bytearray([code])
+    for field, kind in fields:
+        _write(buf, kind, message[field])
+    return bytes(buf)
+
+
+def frame(messages):
+    # One frame of already encoded messages
+    body = b''.join(messages)
+    buf = bytearray()
+    _write_uint(buf, len(body))
+    return bytes(buf) + body
+
+
+def decode_frame(body):
+    # The messages in a frame's body; raises ValueError if it isn't made of whole, known messages
+    reader = _Reader(body)
+    messages = []
+    try:
+        while reader.i < len(body):
+            code = reader.byte()
+            if code not in _TYPES:
+                raise ValueError('Unknown message type {}'.format(code))
+            name, fields = _TYPES[code]
+            message = {'type': name}
+            for field, kind in fields:
+                message[field] = reader.read(kind)
+            messages.append(message)
+    except (IndexError, UnicodeDecodeError, OverflowError) as err:
+        raise ValueError('Malformed frame: {}'.format(err))
+    return messages
+
+
+async def read_frame(reader):
+    # The messages in the next frame from an asyncio StreamReader, or None once the other end has closed
+    n = shift = 0
+    while True:
+        try:
+            byte = (await reader.readexactly(1))[0]
+        except asyncio.IncompleteReadError:
+            return None
+        n |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            break
+        shift += 7
+        if shift > 28:
+            raise ValueError('Frame length too long')
+    if n > MAX_FRAME:
+        raise ValueError('Frame of {} bytes is over {}'.format(n, MAX_FRAME))
+    return decode_frame(await reader.readexactly(n))
+
+
+class Outbox:
+    # Messages for one connection, written as a single frame at the end of the event loop's current pass
+    def __init__(self, writer):
+        self.writer = writer
+        self.bytes_sent = 0
+        self._pending = []
+
+    def send(self, data):
+        if not self._pending:
+            asyncio.get_running_loop().call_soon(self.flush)
+        self._pending.append(data)
+
+    def flush(self):
+        # More than MAX_FRAME bytes goes out in several frames
+        pending, self._pending = self._pending, []
+        if self.writer.is_closing():
+            return
+        start = size = 0
+        for i, data in enumerate(pending):
+            if size + len(data) > MAX_FRAME and i > start:
+                self._write(pending[start:i])
+                start, size = i, 0
+            size += len(data)
+        self._write(pending[start:])
+
+    def _write(self, messages):
+        data = frame(messages)
+        self.writer.write(data)
+        self.bytes_sent += len(data)
+
+
+def public_fields(public_data):
+    return {field: getattr(public_data, field) for field, _ in PRESENCE_FIELDS}
+
+
+def presence_changes(before, after):
+    # The fields of after, a dict of public_fields, that differ from before; every field if before is None
+    if before is None:
+        return dict(after)
+    return {field: value for field, value in after.items() if before.get(field) != value}
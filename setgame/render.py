@@ -0,0 +1,51 @@
+import collections
+import threading
+import time
+
+
+# How long sizes have to stay put before final surfaces are rendered
+SETTLE_TIME = 0.1
+
+
+class BackgroundRenderer:
+    # Renders surfaces on a worker thread. Jobs wait until no new job has come in for SETTLE_TIME, so a run of
+    # size changes only renders the last size, and a newer job for the same owner replaces an older one.
+    # Finished surfaces are collected with finished() on the UI thread.
+    def __init__(self, settle_time=SETTLE_TIME):
+        self.settle_time = settle_time
+        # id(owner) -> (owner, key, render), oldest first
+        self._pending = collections.OrderedDict()
+        self._finished = collections.deque()
+        self._last_submit = 0
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def submit(self, owner, key, render):
+        with self._condition:
+            self._pending.pop(id(owner), None)
+            self._pending[id(owner)] = owner, key, render
+            self._last_submit = time.monotonic()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='background-renderer', daemon=True)
+                self._thread.start()
+            self._condition.notify()
+
+    def cancel(self, owner):
+        with self._condition:
+            self._pending.pop(id(owner), None)
+
+    def finished(self):
+        # (owner, key, surface) for every job done since the last call
+        while self._finished:
+            yield self._finished.popleft()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while True:
+                    wait = self._last_submit + self.settle_time - time.monotonic()
+                    if self._pending and wait <= 0:
+                        break
+                    self._condition.wait(wait if self._pending else None)
+                _, (owner, key, render) = self._pending.popitem(last=False)
+            self._finished.append((owner, key, render()))
@@ -0,0 +1,282 @@
+import bisect
+import collections
+import os
+import random
+import struct
+import time
+
+from . import engine
+from .model import Variant, STANDARD
+
+
+# Where the app keeps replays, under its data directory
+REPLAY_DIR = 'replays'
+
+# Events kept between snapshots of the replayed game; seeking replays at most this many events
+SNAPSHOT_INTERVAL = 32
+
+# A file is a header, then events of varints: microseconds since the previous event, the kind, then its arguments.
+# Cards are packed as in model.Variant; players are numbered in the order they first claim.
+_MAGIC = b'SETRPLAY'
+_VERSION = 1
+_HEADER = struct.Struct('<8sBBBBQd')
+
+START = 0
+DRAW = 1        # slot, card
+DISCARD = 2     # slot
+MOVE = 3        # slot before, slot after
+SELECT = 4      # card
+DESELECT = 5    # card
+CLAIM = 6       # found, player, number of cards, cards...
+PAUSE = 7
+UNPAUSE = 8
+END = 9
+
+_NUM_ARGS = {DRAW: 2, DISCARD: 1, MOVE: 2, SELECT: 1, DESELECT: 1, CLAIM: 3}
+
+# Events the rules produce, which replaying checks rather than applies
+_OUTCOMES = DRAW, DISCARD, MOVE, END
+
+Event = collections.namedtuple('Event', 'time kind args')
+
+
+def new_seed():
+    return random.getrandbits(64)
+
+
+def _write_varint(buf, n):
+    while n >= 0x80:
+        buf.append(n & 0x7f | 0x80)
+        n >>= 7
+    buf.append(n)
+
+
+def _read_varint(data, i):
+    n = shift = 0
+    while True:
+        byte = data[i]
+        i += 1
+        n |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return n, i
+        shift += 7
+
+
+class ReplayWriter(engine.Listener):
+    # Writes a game's events to a file as they happen. Listen to the engine with it and pass it the
+    # player's selections and pauses. It flushes after every claim, pause and the end of the game, so a
+    # crash loses at most the selections since then.
+    def __init__(self, f, seed, variant=STANDARD, clock=time.monotonic):
+        if seed is None:
+            raise ValueError('A game without a seed can\'t be replayed')
+        self.f = f
+        self.clock = clock
+        self._start = clock()
+        self._last = 0
+        self._players = {}
+        f.write(_HEADER.pack(_MAGIC, _VERSION, variant.attributes, variant.values, variant.board_size, seed,
+                             time.time()))
+
+    def _write(self, kind, *args):
+        now = round((self.clock() - self._start) * 1e6)
+        buf = bytearray()
+        _write_varint(buf, now - self._last)
+        buf.append(kind)
+        for arg in args:
+            _write_varint(buf, arg)
+        self.f.write(buf)
+        self._last = now
+
+    def on_card_drawn(self, card, index):
+        self._write(DRAW, index, card)
+
+    def on_card_discarded(self, card, index):
+        self._write(DISCARD, index)
+
+    def on_card_moved(self, card, before, after):
+        self._write(MOVE, before, after)
+
+    def on_claim(self, player, cards, found):
+        number = self._players.setdefault(id(player), len(self._players))
+        self._write(CLAIM, found, number, len(cards), *cards)
+        self.f.flush()
+
+    def on_game_started(self):
+        self._write(START)
+
+    def on_game_ended(self):
+        self._write(END)
+        self.f.flush()
+
+    def select(self, card):
+        self._write(SELECT, card)
+
+    def deselect(self, card):
+        self._write(DESELECT, card)
+
+    def pause(self):
+        self._write(PAUSE)
+        self.f.flush()
+
+    def unpause(self):
+        self._write(UNPAUSE)
+
+    def close(self):
+        self.f.close()
+
+
+def record(directory, seed, variant=STANDARD):
+    # A writer for a new file in directory, named by when the game started
+    os.makedirs(directory, exist_ok=True)
+    filename = '{}-{:016x}.setreplay'.format(time.strftime('%Y%m%d-%H%M%S'), seed)
+    return ReplayWriter(open(os.path.join(directory, filename), 'wb'), seed, variant)
+
+
+def read(data):
+    # (seed, variant, wall time the game started, [Event]) from a replay's bytes. An event cut short at the end,
+    # as when the game crashed while writing it, is left out.
+    magic, version, attributes, values, board_size, seed, started = _HEADER.unpack_from(data)
+    if magic != _MAGIC or version != _VERSION:
+        raise ValueError('Not a version {} replay'.format(_VERSION))
+    variant = Variant(attributes, values, board_size)
+
+    events = []
+    i = _HEADER.size
+    t = 0
+    try:
+        while i < len(data):
+            dt, i = _read_varint(data, i)
+            kind = data[i]
+            i += 1
+            if kind > END:
+                raise ValueError('Unknown event {} at byte {} of the replay'.format(kind, i - 1))
+            args = []
+            for _ in range(_NUM_ARGS.get(kind, 0)):
+                arg, i = _read_varint(data, i)
+                args.append(arg)
+            if kind == CLAIM:
+                for _ in range(args[-1]):
+                    arg, i = _read_varint(data, i)
+                    args.append(arg)
+            t += dt
+            events.append(Event(t / 1e6, kind, tuple(args)))
+    except IndexError:
+        pass
+    return seed, variant, started, events
+
+
+class Replay(engine.Listener):
+    # Re-runs a recorded game through the engine, checking that the rules deal and discard what was recorded.
+    # Snapshots taken every SNAPSHOT_INTERVAL events let seek() jump to any time without replaying from the start.
+    def __init__(self, seed, variant, events, snapshot_interval=SNAPSHOT_INTERVAL):
+        self.seed = seed
+        self.variant = variant
+        self.events = events
+        self.game = engine.Game(seed, listener=self, variant=variant)
+
+        # The position: events[:self.position] are applied
+        self.position = 0
+        self.selected = set()
+        self.paused = False
+        self._expected = collections.deque()
+
+        self._snapshots = []
+        self._snapshot_times = []
+        self._snapshot()
+        for _ in events:
+            self.step()
+            if self.position % snapshot_interval == 0:
+                self._snapshot()
+        if self._expected:
+            raise ValueError('The replay ends before the outcome of its last event')
+
+    @classmethod
+    def from_bytes(cls, data, snapshot_interval=SNAPSHOT_INTERVAL):
+        seed, variant, _, events = read(data)
+        return cls(seed, variant, events, snapshot_interval)
+
+    @classmethod
+    def load(cls, filename, snapshot_interval=SNAPSHOT_INTERVAL):
+        with open(filename, 'rb') as f:
+            return cls.from_bytes(f.read(), snapshot_interval)
+
+    @property
+    def time(self):
+        return self.events[self.position - 1].time if self.position else 0
+
+    @property
+    def duration(self):
+        return self.events[-1].time if self.events else 0
+
+    @property
+    def board(self):
+        # The cards in each slot, None where a slot is empty
+        return list(self.game.deck.slots)
+
+    # The engine's outcomes, queued to be checked against the recorded ones
+    def on_card_drawn(self, card, index):
+        self._expected.append((DRAW, (index, card)))
+
+    def on_card_discarded(self, card, index):
+        self._expected.append((DISCARD, (index,)))
+
+    def on_card_moved(self, card, before, after):
+        self._expected.append((MOVE, (before, after)))
+
+    def on_game_ended(self):
+        self._expected.append((END, ()))
+
+    def step(self):
+        event = self.events[self.position]
+        kind, args = event.kind, event.args
+        if kind in _OUTCOMES:
+            # A game's first cards are drawn before it reports that it started
+            if self.game.state == engine.Game.STATE_UNSTARTED:
+                self.game.start()
+            if not self._expected or self._expected.popleft() != (kind, args):
+                raise ValueError('The rules disagree with event {} of the replay: {}'.format(self.position, event))
+        elif kind == START:
+            if self.game.state == engine.Game.STATE_UNSTARTED:
+                self.game.start()
+        elif kind == SELECT:
+            self.selected.add(args[0])
+        elif kind == DESELECT:
+            self.selected.discard(args[0])
+        elif kind == CLAIM:
+            found, player, cards = args[0], args[1], list(args[3:])
+            if self.game.claim(player, cards) != bool(found):
+                raise ValueError('The rules disagree with event {} of the replay: {}'.format(self.position, event))
+        elif kind == PAUSE:
+            self.paused = True
+        elif kind == UNPAUSE:
+            self.paused = False
+        self.position += 1
+
+    def _snapshot(self):
+        game = self.game
+        self._snapshots.append((self.position, game.deck.snapshot(), list(game.found_sets),
+                                list(game.wrong_claims), game.state, frozenset(self.selected), self.paused,
+                                tuple(self._expected)))
+        self._snapshot_times.append(self.time)
+
+    def _restore(self, snapshot):
+        self.position, deck, found_sets, wrong_claims, state, selected, self.paused, expected = snapshot
+        self.game.deck.restore(deck)
+        self.game.found_sets = list(found_sets)
+        self.game.wrong_claims = list(wrong_claims)
+        self.game.state = state
+        self.selected = set(selected)
+        self._expected = collections.deque(expected)
+
+    def seek(self, t):
+        # Moves to just after the last event at or before t seconds into the game
+        i = bisect.bisect_right(self._snapshot_times, t) - 1
+        snapshot = self._snapshots[max(i, 0)]
+        if self.position < snapshot[0] or self.time > t:
+            self._restore(snapshot)
+        while self.position < len(self.events) and self.events[self.position].time <= t:
+            self.step()
+
+    def board_at(self, t):
+        self.seek(t)
+        return self.board
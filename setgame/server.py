@@ -0,0 +1,248 @@
+import argparse
+import asyncio
+import itertools
+import random
+import signal
+import time
+
+from . import engine, protocol
+from .replay import new_seed
+
+
+HOST = '127.0.0.1'
+PORT = 8707
+
+
+class Member:
+    # A connection that has joined a room
+    def __init__(self, id_, name, writer):
+        self.id = id_
+        self.name = name
+        self.outbox = protocol.Outbox(writer)
+
+    def send(self, data):
+        self.outbox.send(data)
+
+
+class Room(engine.Listener):
+    # Holds the one true game for its members. Claims are resolved in the order the server receives them: the
+    # first claim on a set takes it, and later claims on any of its cards are stale rather than wrong.
+    # Each claim is followed by the board deltas it caused.
+    def __init__(self, name, seed=None, variant=engine.STANDARD, seeds=None):
+        self.name = name
+        self.variant = variant
+        # Where new games' seeds come from, if not the system's randomness
+        self.seeds = seeds
+        self.members = {}
+        self.game = None
+        self.seed = None
+        self.started = 0
+        # [player, cards, found] for every claim of the current game that wasn't stale, in order
+        self.claims = []
+        self._arrival = 0
+        self.new_game(seed)
+
+    def new_game(self, seed=None):
+        if seed is None:
+            seed = new_seed() if self.seeds is None else self.seeds.getrandbits(64)
+        self.seed = seed
+        self.broadcast({'type': 'new-game', 'seed': self.seed})
+        self.game = engine.Game(self.seed, listener=self, variant=self.variant)
+        self.started = time.monotonic()
+        self.claims = []
+        self.game.start()
+
+    def broadcast(self, message, exclude=None):
+        # Encoded once for every member
+        data = protocol.encode(message)
+        for member in self.members.values():
+            if member is not exclude:
+                member.send(data)
+
+    def on_card_drawn(self, card, index):
+        self.broadcast({'type': 'drawn', 'slot': index, 'card': card})
+
+    def on_card_discarded(self, card, index):
+        self.broadcast({'type': 'discarded', 'slot': index})
+
+    def on_card_moved(self, card, before, after):
+        self.broadcast({'type': 'moved', 'before': before, 'after': after})
+
+    def on_claim(self, player, cards, found):
+        self.claims.append([player, cards, found])
+        # A claim read in the same frame as the join or restart that started the game arrived before it did
+        self.broadcast({'type': 'claimed', 'player': player, 'cards': cards, 'found': found,
+                        'time': max(0.0, self._arrival - self.started)})
+
+    def enter(self, member):
+        self.broadcast({'type': 'entered', 'player': member.id, 'name': member.name})
+        self.members[member.id] = member
+        self.send_joined(member)
+
+    def send_joined(self, member):
+        # Everything a member needs to deal the current game and catch up to it
+        variant = self.variant
+        member.send(protocol.encode({
+            'type': 'joined', 'room': self.name, 'player': member.id, 'seed': self.seed,
+            'variant': [variant.attributes, variant.values, variant.board_size],
+            'players': {id_: other.name for id_, other in self.members.items()},
+            'claims': self.claims,
+        }))
+
+    def leave(self, member):
+        del self.members[member.id]
+        self.broadcast({'type': 'left', 'player': member.id})
+
+    def select(self, member, cards):
+        self.broadcast({'type': 'selected', 'player': member.id, 'cards': cards}, exclude=member)
+
+    def claim(self, member, cards, arrival):
+        game = self.game
+        if game.state != engine.Game.STATE_STARTED or not all(game.deck.is_in_play(card) for card in cards):
+            member.send(protocol.encode({'type': 'stale', 'cards': cards}))
+            return None
+        self._arrival = arrival
+        return game.claim(member.id, cards)
+
+    def restart(self):
+        if self.game.state == engine.Game.STATE_COMPLETE:
+            self.new_game()
+
+
+class Server:
+    # Any number of rooms on one event loop. A room is made when someone joins it and dropped once it's empty.
+    def __init__(self, variant=engine.STANDARD, seed=None):
+        if max(variant.cards) > 0xff:
+            raise ValueError('{} has cards that don\'t fit in a byte on the wire'.format(variant))
+        self.variant = variant
+        # With a seed, each room deals the same games every run, whatever order rooms are made in
+        self.seed = seed
+        self.rooms = {}
+        self.connections = 0
+        self.messages = 0
+        self._ids = itertools.count(1)
+        self._server = None
+        # The task handling each open connection
+        self._handlers = set()
+
+    async def start(self, host=HOST, port=PORT):
+        # Returns the port, which the system picks when port is 0
+        self._server = await asyncio.start_server(self.handle_connection, host, port)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        async with self._server:
+            await self._server.serve_forever()
+
+    def close(self):
+        # Stops accepting connections and closes the open ones; wait_closed() waits for them to finish
+        self._server.close()
+        for handler in self._handlers:
+            handler.cancel()
+
+    async def wait_closed(self):
+        await asyncio.gather(*self._handlers, return_exceptions=True)
+        await self._server.wait_closed()
+
+    def join(self, member, name):
+        room = self.rooms.get(name)
+        if room is None:
+            seeds = None if self.seed is None else random.Random('{}:{}'.format(self.seed, name))
+            room = self.rooms[name] = Room(name, variant=self.variant, seeds=seeds)
+        room.enter(member)
+        return room
+
+    def leave(self, member, room):
+        room.leave(member)
+        if not room.members:
+            del self.rooms[room.name]
+
+    def handle_message(self, member, room, message, arrival):
+        # Returns the room the member is in afterwards
+        self.messages += 1
+        kind = message['type']
+        if kind == 'join':
+            member.name = message['name']
+            if room is not None and room.name == message['room']:
+                # Joining the same room again, to catch up; leaving could drop the room and its game
+                room.send_joined(member)
+                return room
+            if room is not None:
+                self.leave(member, room)
+            return self.join(member, message['room'])
+        if room is None:
+            member.send(protocol.encode({'type': 'error', 'reason': 'not in a room'}))
+        elif kind == 'leave':
+            self.leave(member, room)
+            return None
+        elif kind == 'claim':
+            room.claim(member, message['cards'], arrival)
+        elif kind == 'select':
+            room.select(member, message['cards'])
+        elif kind == 'restart':
+            room.restart()
+        return room
+
+    async def handle_connection(self, reader, writer):
+        self.connections += 1
+        handler = asyncio.current_task()
+        self._handlers.add(handler)
+        member = Member(next(self._ids), None, writer)
+        room = None
+        try:
+            while True:
+                messages = await protocol.read_frame(reader)
+                if messages is None:
+                    break
+                # Stamped as soon as they're read; nothing else runs before they're handled, so claims are
+                # handled in the order of their stamps
+                arrival = time.monotonic()
+                for message in messages:
+                    room = self.handle_message(member, room, message, arrival)
+                await writer.drain()
+        except (ConnectionError, ValueError, asyncio.IncompleteReadError):
+            pass
+        except asyncio.CancelledError:
+            # Closed by close(); the handler is the connection's own task, so nothing is waiting on it
+            pass
+        finally:
+            if room is not None:
+                self.leave(member, room)
+            self.connections -= 1
+            self._handlers.discard(handler)
+            writer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Host multiplayer Set games.')
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT, help='0 picks a free port')
+    parser.add_argument('--seed', type=int, help='deal the same sequence of games every run')
+    args = parser.parse_args()
+
+    server = Server(seed=args.seed)
+
+    async def serve():
+        port = await server.start(args.host, args.port)
+        print('serving on {}:{}'.format(args.host, port), flush=True)
+        try:
+            # Ctrl+C closes every connection cleanly; where signal handlers aren't supported, it interrupts
+            asyncio.get_running_loop().add_signal_handler(signal.SIGINT, server.close)
+        except NotImplementedError:
+            pass
+        try:
+            await server.serve_forever()
+        except asyncio.CancelledError:
+            pass
+        await server.wait_closed()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    # Read by the load test
+    print('{} messages received, {:.3f}s of CPU'.format(server.messages, time.process_time()), flush=True)
+
+
+if __name__ == '__main__':
+    main()
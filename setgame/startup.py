@@ -0,0 +1,86 @@
+import builtins
+import contextlib
+import sys
+import time
+
+
+# Imports and loads faster than this are left out of the report
+MIN_MS = 1.0
+
+
+class StartupProfile:
+    # Times everything between the start of the process and the first frame: each module imported, each phase
+    # of main.py and each component's on_load. Times are inclusive; self times leave out nested imports and loads.
+    def __init__(self, min_ms=MIN_MS, quit_after_first_frame=False):
+        self.min_ms = min_ms
+        self.quit_after_first_frame = quit_after_first_frame
+        self.start = time.perf_counter()
+        self.first_frame = None
+        self.imports = []
+        self.phases = []
+        self.loads = []
+        self._import = None
+        # Records being timed, innermost last, for each of the lists above
+        self._stacks = {}
+
+    def track_imports(self):
+        self._import = builtins.__import__
+
+        def timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+            if level or name in sys.modules:
+                return self._import(name, globals, locals, fromlist, level)
+            with self._timed(self.imports, name):
+                return self._import(name, globals, locals, fromlist, level)
+
+        builtins.__import__ = timed_import
+
+    def track_loads(self, component_class):
+        load = component_class.load
+
+        def timed_load(component):
+            with self._timed(self.loads, type(component).__name__):
+                load(component)
+
+        component_class.load = timed_load
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        with self._timed(self.phases, name):
+            yield
+
+    def on_first_frame(self):
+        self.first_frame = time.perf_counter() - self.start
+        if self._import is not None:
+            builtins.__import__ = self._import
+
+    @contextlib.contextmanager
+    def _timed(self, records, name):
+        # Each record is [depth, name, total, self]; nested records take their time out of their parent's self time
+        stack = self._stacks.setdefault(id(records), [])
+        record = [len(stack), name, 0, 0]
+        records.append(record)
+        stack.append(record)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            stack.pop()
+            record[2] = elapsed
+            record[3] += elapsed
+            if stack:
+                stack[-1][3] -= elapsed
+
+    def _section(self, title, records):
+        lines = ['{:<40} {:>9} {:>9}'.format(title, 'total ms', 'self ms')]
+        for depth, name, total, self_time in records:
+            if total * 1000 >= self.min_ms:
+                lines.append('{:<40} {:>9.1f} {:>9.1f}'.format('  ' * depth + name, total * 1000, self_time * 1000))
+        return lines
+
+    def __str__(self):
+        lines = ['{:.1f} ms to the first frame'.format((self.first_frame or 0) * 1000), '']
+        lines += self._section('phase', self.phases) + ['']
+        lines += self._section('import', self.imports) + ['']
+        lines += self._section('on_load', self.loads)
+        return '\n'.join(lines)
@@ -0,0 +1,167 @@
+import collections
+import heapq
+
+
+# Sizes, in games, of the rolling windows
+WINDOWS = 10, 100
+
+
+def game_record(summary, player_summary):
+    # What a player's history keeps of a game. Wrong claims are kept as how often each attribute was right in
+    # them, which is all the accuracy stats need.
+    attributes = [0] * summary.variant.attributes
+    for claim in player_summary.wrong_claims:
+        for i, match in enumerate(summary.variant.attribute_matches(claim.cards)):
+            attributes[i] += match
+    return {
+        'time': summary.time.in_s(),
+        'sets': len(player_summary.found_sets),
+        'won': player_summary.won,
+        'wrong': len(player_summary.wrong_claims),
+        'wrong_attributes': attributes,
+    }
+
+
+class RunningMedian:
+    # The lower half of the values in a max-heap and the upper half in a min-heap, so adding a value is
+    # O(log n) and the median is read off the tops
+    def __init__(self):
+        self._lower = []
+        self._upper = []
+
+    def add(self, value):
+        if self._lower and value > -self._lower[0]:
+            heapq.heappush(self._upper, value)
+        else:
+            heapq.heappush(self._lower, -value)
+        if len(self._lower) > len(self._upper) + 1:
+            heapq.heappush(self._upper, -heapq.heappop(self._lower))
+        elif len(self._upper) > len(self._lower):
+            heapq.heappush(self._lower, -heapq.heappop(self._upper))
+
+    @property
+    def median(self):
+        if not self._lower:
+            return None
+        if len(self._lower) > len(self._upper):
+            return -self._lower[0]
+        return (-self._lower[0] + self._upper[0]) / 2
+
+    def __len__(self):
+        return len(self._lower) + len(self._upper)
+
+
+class RollingWindow:
+    # Sums over the latest size games, updated as games enter and leave
+    def __init__(self, size):
+        self.size = size
+        self._games = collections.deque()
+        self.time = 0
+        self.sets = 0
+        self.wins = 0
+
+    def add(self, time, sets, won):
+        if len(self._games) == self.size:
+            old_time, old_sets, old_won = self._games.popleft()
+            self.time -= old_time
+            self.sets -= old_sets
+            self.wins -= old_won
+        self._games.append((time, sets, won))
+        self.time += time
+        self.sets += sets
+        self.wins += won
+
+    @property
+    def games(self):
+        return len(self._games)
+
+    @property
+    def mean_time(self):
+        return self.time / self.games if self.games else None
+
+    @property
+    def sets_per_minute(self):
+        return self.sets * 60 / self.time if self.time else None
+
+    @property
+    def win_rate(self):
+        return self.wins / self.games if self.games else None
+
+
+class PlayerStats:
+    # Running aggregates over a player's games, updated as each game ends instead of rescanning the history.
+    # Records are dicts from game_record; keys missing from older records count as zero.
+    def __init__(self, windows=WINDOWS):
+        self.games = 0
+        self.wins = 0
+        self.time = 0
+        self.sets = 0
+        self.best_time = None
+        self.wrong_claims = 0
+        self.wrong_attributes = []
+        self._times = RunningMedian()
+        self.windows = {size: RollingWindow(size) for size in windows}
+
+    @classmethod
+    def rebuild(cls, records, windows=WINDOWS):
+        # One pass over an existing history, oldest game first
+        stats = cls(windows)
+        for record in records:
+            stats.add(record)
+        return stats
+
+    def add(self, record):
+        time = record.get('time', 0)
+        sets = record.get('sets', 0)
+        won = bool(record.get('won'))
+
+        self.games += 1
+        self.wins += won
+        self.time += time
+        self.sets += sets
+        if won:
+            self._times.add(time)
+            if self.best_time is None or time < self.best_time:
+                self.best_time = time
+
+        self.wrong_claims += record.get('wrong', 0)
+        attributes = record.get('wrong_attributes', ())
+        if len(attributes) > len(self.wrong_attributes):
+            self.wrong_attributes += [0] * (len(attributes) - len(self.wrong_attributes))
+        for i, right in enumerate(attributes):
+            self.wrong_attributes[i] += right
+
+        for window in self.windows.values():
+            window.add(time, sets, won)
+
+    @property
+    def median_time(self):
+        # Of won games, like best_time
+        return self._times.median
+
+    @property
+    def sets_per_minute(self):
+        return self.sets * 60 / self.time if self.time else None
+
+    @property
+    def attribute_accuracy(self):
+        # For each attribute, the fraction of wrong claims that were right in it; a low one is the attribute
+        # the player misreads most
+        if not self.wrong_claims:
+            return None
+        return [right / self.wrong_claims for right in self.wrong_attributes]
+
+    def __str__(self):
+        lines = ['{} games, {} won, {} sets'.format(self.games, self.wins, self.sets)]
+        if self.best_time is not None:
+            lines.append('best {:.1f}s, median {:.1f}s'.format(self.best_time, self.median_time))
+        if self.sets_per_minute is not None:
+            lines.append('{:.2f} sets per minute'.format(self.sets_per_minute))
+        for size, window in sorted(self.windows.items()):
+            if window.sets_per_minute is not None:
+                lines.append('last {}: {:.1f}s per game, {:.2f} sets per minute'.format(
+                    size, window.mean_time, window.sets_per_minute))
+        if self.attribute_accuracy is not None:
+            lines.append('attributes right in wrong claims: {}'.format(
+                ', '.join('{:.0%}'.format(accuracy) for accuracy in self.attribute_accuracy)))
+        return '\n'.join(lines)
@@ -1,14 +1,42 @@
+import collections
+import functools
+import threading
+
 import pygame
 
 
+# Symbol sizes to keep atlases for; a resize only needs the new size, the rest are for quickly resizing back
+MAX_ATLASES = 4
+
+# Pile surfaces to keep: every layer count of both piles at a couple of sizes, and every card on top of the discard pile
+MAX_STACKS = 64
+MAX_TOP_CARDS = 81
+
+
 def compose(config):
+    # Cards can be rendered on a worker thread while piles render on the UI thread, and they share the caches below
+    lock = threading.Lock()
+
+    def locked(factory):
+        @functools.wraps(factory)
+        def wrapper(*args, **kwargs):
+            with lock:
+                return factory(*args, **kwargs)
+        return wrapper
+
+    symbol_color = config.style_get('symbol-color', 'card', 'setgame')
+    symbol_texture = config.style_get('symbol-texture', 'card', 'setgame')
+    symbol_shape = config.style_get('symbol-shape', 'card', 'setgame')
+    card_front = config.style_get('front', 'card', 'setgame')
+    card_back = config.style_get('back', 'card', 'setgame')
+
     def symbol(size, color, texture, shape):
         black = (0, 0, 0)
 
         s_color = pygame.Surface(size, pygame.SRCALPHA)
-        s_color.fill(config.style_get('symbol-color', 'card', 'setgame')(color))
-        s_texture = config.style_get('symbol-texture', 'card', 'setgame')(size, texture)
-        s_outline, s_mask = config.style_get('symbol-shape', 'card', 'setgame')(size, shape)
+        s_color.fill(symbol_color(color))
+        s_texture = symbol_texture(size, texture)
+        s_outline, s_mask = symbol_shape(size, shape)
 
         surf = pygame.Surface(size, pygame.SRCALPHA)
 
@@ -22,11 +50,26 @@ def compose(config):
 
         return surf
 
+    # Symbol size -> the symbols of that size rendered so far, keyed by (color, texture, shape)
+    atlases = collections.OrderedDict()
+
+    def atlas_symbol(size, color, texture, shape):
+        try:
+            symbols = atlases[size]
+            atlases.move_to_end(size)
+        except KeyError:
+            symbols = atlases[size] = {}
+            if len(atlases) > MAX_ATLASES:
+                atlases.popitem(last=False)
+        if (color, texture, shape) not in symbols:
+            symbols[color, texture, shape] = symbol(size, color, texture, shape)
+        return symbols[color, texture, shape]
+
     def card(size, number, color, texture, shape, border=True, face_up=True, selected=False):
         if not face_up:
-            return config.style_get('back', 'card', 'setgame')(size, border)
+            return card_back(size, border)
 
-        card_image = config.style_get('front', 'card', 'setgame')(size, border, selected)
+        card_image = card_front(size, border, selected)
         rect = card_image.get_rect()
 
         number += 1
@@ -41,50 +84,72 @@ def compose(config):
 
         sym_y = (rect.h - total_h)//2
 
+        sym_image = atlas_symbol((sym_w, sym_h), color, texture, shape)
         for _ in range(number):
-            card_image.blit(symbol((sym_w, sym_h), color, texture, shape), (sym_x, sym_y))
+            card_image.blit(sym_image, (sym_x, sym_y))
             sym_y += sym_h + y_gap
 
         return card_image
 
-    def draw_pile(size, num_cards, top_card):
-        card_w = size[0] // 1.3
-        card_h = size[1] // 1.3
-        layers = (num_cards + 3) // 6 + 1 if num_cards else 0
+    def pile_card_size(size):
+        return size[0] // 1.3, size[1] // 1.3
+
+    def pile_layers(num_cards):
+        return (num_cards + 3) // 6 + 1 if num_cards else 0
+
+    def draw_pile_layer(size, i):
+        card_w, card_h = pile_card_size(size)
+        return 2 * i, size[1] - card_h - 2 * i
+
+    def discard_pile_layer(size, i):
+        card_w, card_h = pile_card_size(size)
+        return size[0] - card_w - 1 - 2 * i, size[1] - card_h - 1 - 2 * i
+
+    # (layer function, size, layers) -> that many layers of the pile's cards, without a top card
+    stacks = collections.OrderedDict()
+
+    def stack(layer, size, layers):
+        key = layer, size, layers
+        if key in stacks:
+            stacks.move_to_end(key)
+            return stacks[key]
+        if layers:
+            # Each stack is the one below it plus one more layer on top
+            surf = stack(layer, size, layers - 1).copy()
+            image = card_back if layer is draw_pile_layer else card_front
+            surf.blit(image(pile_card_size(size)), layer(size, layers - 1))
+        else:
+            surf = pygame.Surface(size, pygame.SRCALPHA)
+        stacks[key] = surf
+        if len(stacks) > MAX_STACKS:
+            stacks.popitem(last=False)
+        return surf
 
-        surf = pygame.Surface(size, pygame.SRCALPHA)
-        rect = surf.get_rect()
+    # (size, card values) -> the card's face at the size of a pile's cards
+    top_cards = collections.OrderedDict()
 
-        card_x = 0
-        card_y = rect.h - card_h
-        back_img = config.style_get('back', 'card', 'setgame')((card_w, card_h))
-        for _ in range(layers):
-            surf.blit(back_img, (card_x, card_y))
-            card_x += 2
-            card_y -= 2
+    def top_card_image(size, values):
+        key = size, values
+        if key in top_cards:
+            top_cards.move_to_end(key)
+        else:
+            top_cards[key] = card(pile_card_size(size), *values)
+            if len(top_cards) > MAX_TOP_CARDS:
+                top_cards.popitem(last=False)
+        return top_cards[key]
 
-        return surf
+    def draw_pile(size, num_cards, top_card):
+        return stack(draw_pile_layer, tuple(size), pile_layers(num_cards))
 
     def discard_pile(size, num_cards, top_card):
-        card_w = size[0] // 1.3
-        card_h = size[1] // 1.3
-        layers = (num_cards + 3) // 6 + 1 if num_cards else 0
-
-        surf = pygame.Surface(size, pygame.SRCALPHA)
-        rect = surf.get_rect()
-
-        card_x = rect.w - card_w - 1
-        card_y = rect.h - card_h - 1
-        front_img = config.style_get('front', 'card', 'setgame')((card_w, card_h))
-        for _ in range(layers):
-            surf.blit(front_img, (card_x, card_y))
-            card_x -= 2
-            card_y -= 2
-        if top_card is not None:
-            surf.blit(card((card_w, card_h), *top_card.values), (card_x + 2, card_y + 2))
-
+        size = tuple(size)
+        layers = pile_layers(num_cards)
+        if top_card is None:
+            return stack(discard_pile_layer, size, layers)
+        surf = stack(discard_pile_layer, size, layers).copy()
+        surf.blit(top_card_image(size, tuple(top_card.values)), discard_pile_layer(size, layers - 1))
         return surf
 
-    config.style_add('background', 'card', 'setgame', card)
-    config.style_add('background', 'discard-pile', 'setgame', discard_pile)
-    config.style_add('background', 'draw-pile', 'setgame', draw_pile)
+    config.style_add('background', 'card', 'setgame', locked(card))
+    config.style_add('background', 'discard-pile', 'setgame', locked(discard_pile))
+    config.style_add('background', 'draw-pile', 'setgame', locked(draw_pile))
@@ -1,6 +1,18 @@
+import functools
+
 import pygame
 import pygame.gfxdraw
 
+try:
+    import numpy
+    import pygame.surfarray
+except ImportError:
+    numpy = None
+
+
+# Symbol sizes to keep textures and shapes for
+CACHED_SIZES = 8
+
 
 def play_deck_bg(size):
     surf = pygame.Surface(size, pygame.SRCALPHA)
@@ -59,6 +71,11 @@ def symbol_color(color):
 
 
 def symbol_texture(size, texture):
+    return _symbol_texture(tuple(size), texture).copy()
+
+
+@functools.lru_cache(maxsize=CACHED_SIZES * 3)
+def _symbol_texture(size, texture):
     white = (255, 255, 255)
 
     mask = pygame.Surface(size)
@@ -68,6 +85,12 @@ def symbol_texture(size, texture):
         pass
 
     def stripe_texture():
+        if numpy is not None:
+            # The same columns the lines below would draw: every fourth one, starting at x = 3
+            pixels = pygame.surfarray.pixels3d(mask)
+            pixels[3::4, :] = white
+            del pixels
+            return
         n = rect.w // 4
         for i in range(1, n+1):
             pygame.draw.line(mask, white, (i * 4 - 1, 0), (i * 4 - 1, rect.h), 1)
@@ -81,6 +104,13 @@ def symbol_texture(size, texture):
 
 
 def symbol_shape(size, shape):
+    # Callers draw on the outline and mask, so hand out copies
+    outline, mask = _symbol_shape(tuple(size), shape)
+    return outline.copy(), mask.copy()
+
+
+@functools.lru_cache(maxsize=CACHED_SIZES * 3)
+def _symbol_shape(size, shape):
     white = (255, 255, 255)
 
     mask = pygame.Surface(size)
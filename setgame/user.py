@@ -1,9 +1,14 @@
-import os.path
-import pickle
 import time
 import socket
 
-from setgame.style import default
+from . import presence
+from .stats import PlayerStats
+from .userstore import UserStore
+
+
+# UserModel attributes kept in each user's header; address_info and history live in their own logs
+HEADER_FIELDS = ('name', 'id', 'address', 'common_addresses', 'style', 'options', 'controls', 'friends',
+                 'outgoing_requests', 'sent_requests', 'received_requests', 'version')
 
 
 def get_local_address():
@@ -15,42 +20,71 @@ def get_local_address():
     return result
 
 
-def gen_id():
-    return 1  # TODO
+def gen_id(dir_user_data):
+    return UserStore(dir_user_data).next_id()
+
+
+def _header(fields):
+    return {name: fields.get(name) for name in HEADER_FIELDS}
 
 
-def save_user_data(filename, model):
-    with open(filename, 'w') as f:
-        pickle.dump(model, f)
+def save_user_data(dir_user_data, model):
+    model.save(dir_user_data)
+
+
+def load_user_model(dir_user_data, id_):
+    # Only the header and address log are read; history is read the first time it's used
+    store = UserStore(dir_user_data)
+    header = store.load_header(id_)
+    address_info = {}
+    for address, num_logins, first_login, last_login in store.read_addresses(id_):
+        if address in address_info:
+            info = address_info[address]
+            info.num_logins += num_logins
+            info.first_login = min(info.first_login, first_login)
+            info.last_login = max(info.last_login, last_login)
+        else:
+            address_info[address] = AddressInfo(address, num_logins, first_login, last_login)
+    model = UserModel(header['name'], header['id'],
+                      header['address'], address_info, header['common_addresses'],
+                      header['style'], header['options'], header['controls'],
+                      header['friends'], header['outgoing_requests'], header['sent_requests'],
+                      header['received_requests'],
+                      None,
+                      header['version'])
+    model.store = store
+    return model
 
 
-def load_user_model(filename):
-    with open(filename, 'r') as f:
-        return pickle.load(f)
+def migrate_user_data(dir_user_data):
+    # Imports users saved as pickles by older versions
+    return UserStore(dir_user_data).migrate_pickles(_header)
 
 
 def create_user(dir_user_data, name):
-    new_model = UserModel(name, gen_id(),
-                          None, [], [],
+    new_model = UserModel(name, gen_id(dir_user_data),
+                          None, {}, [],
+                          None, None, None,
+                          [], [], [], [],
                           [],
-                          time.time(),
-                          None,
-                          None,
-                          None,
-                          [], [], [], [])
+                          0)
 
-    new_model.change_address(local_address)  # TODO: Get local IP address
+    new_model.change_address(get_local_address())
     new_model.save(dir_user_data)
 
     return User(new_model)
 
 
-def login(dir_user_data, id_):
-    model = load_user_model(os.path.join(dir_user_data, id_))
-    user = User(model)
+def login(dir_user_data, id_, connection=None, hub=None):
+    # connection, if given, follows the user and their friends from now on
+    model = load_user_model(dir_user_data, id_)
+    user = User(model, hub)
+    local_address = get_local_address()
     if local_address != model.address:
         model.change_address(local_address)
         model.save()
+    if connection is not None:
+        user.connect(connection)
     user.broadcast()
     return user
 
@@ -70,10 +104,10 @@ class AddressInfo:
 
 class PublicData:
     def __init__(self, user):
-        self.name = user.label_name
+        self.name = user.name
         self.id = user.id
         self.address = user.address
-        self.common_addresses = user.common_addresses()
+        self.common_addresses = user.common_addresses
         self.friends = user.friends
         self.version = user.version
 
@@ -101,50 +135,92 @@ class UserModel:
         self.sent_requests = sent_requests
         self.received_requests = received_requests
 
-        # History
-        self.history = history
+        # History; None until read from the store, and the stats over it, built when first used
+        self._history = history
+        self._stats = None
 
         # Version
         self.version = version
 
+        # Where the model is saved, and the log records not saved yet
+        self.store = None
+        self._new_history = list(history or [])
+        self._new_logins = []
+
+    @property
+    def history(self):
+        if self._history is None:
+            self._history = self.store.read_history(self.id) if self.store is not None else []
+        return self._history
+
+    @property
+    def stats(self):
+        if self._stats is None:
+            self._stats = PlayerStats.rebuild(self.history)
+        return self._stats
+
+    def add_history(self, record):
+        if self._history is not None:
+            self._history.append(record)
+        if self._stats is not None:
+            self._stats.add(record)
+        self._new_history.append(record)
+
     def change_address(self, address):
         self.address = address
         current_time = time.time()
         if address not in self.address_info:
-            address_info = AddressInfo(address, 1, current_time, current_time)
+            address_info = AddressInfo(address, 0, current_time, current_time)
             self.address_info[address] = address_info
         else:
             address_info = self.address_info[address]
         address_info.num_logins += 1
         address_info.last_login = current_time
-        if address_info.recurrence > 10:
+        self._new_logins.append((address, 1, current_time, current_time))
+        if address_info.recurrence > 10 and address not in self.common_addresses:
             self.common_addresses.append(address)
-            self.common_addresses.sort(lambda x: x.recurrence)
+            self.common_addresses.sort(key=lambda x: self.address_info[x].recurrence)
 
-    def save(self, dir_user_data):
+    def save(self, dir_user_data=None):
+        # Rewrites the header and appends whatever was added to the logs since the last save
+        if dir_user_data is not None and (self.store is None or self.store.directory != dir_user_data):
+            self.store = UserStore(dir_user_data)
         self.version += 1
-        save_user_data(dir_user_data, self)
+        for login in self._new_logins:
+            self.store.append_address(self.id, *login)
+        for record in self._new_history:
+            self.store.append_history(self.id, record)
+        self.store.save_header(_header(vars(self)))
+        self._new_logins.clear()
+        self._new_history.clear()
 
 
 class User:
-    def __init__(self, model):
+    def __init__(self, model, hub=None):
         self.model = model
         self.online = True
         self.connections = []
+        # Friends' connections and this user's own follow it on the hub
+        self.hub = presence.HUB if hub is None else hub
+
+    def connect(self, connection):
+        # A connection of this user's, which sees their own presence and their friends'
+        self.connections.append(connection)
+        self.hub.subscribe(connection, [self.model.id] + list(self.model.friends))
+
+    def disconnect(self, connection):
+        self.connections.remove(connection)
+        self.hub.unsubscribe(connection)
 
     def broadcast(self):
-        public_data = PublicData(self.model)
-        for friend in self.model.friends:
-            # TODO: Send public data to friend
-            pass
+        # Encoded once and queued for every connection following this user; nothing is sent if nothing changed
+        return self.hub.publish(PublicData(self.model))
 
     def notify_all(self):
-        public_data = PublicData(self.model)
-        for friend in self.connections:
-            # TODO: Send public data to friend
-            pass
+        # This user's own connections follow them like their friends' do, so one publish reaches both
+        return self.broadcast()
 
     def rename(self, name):
-        self.model.label_name = name
+        self.model.name = name
         self.model.save()
         self.notify_all()
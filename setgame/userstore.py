@@ -0,0 +1,155 @@
+import json
+import os
+import pickle
+
+
+# Bumped whenever the layout of headers or log records changes
+FORMAT = 1
+
+INDEX = 'index.jsonl'
+
+
+def _repair(path):
+    # Finishes a last line left without its newline if it holds a whole record, and cuts it off if it doesn't
+    try:
+        f = open(path, 'rb+')
+    except FileNotFoundError:
+        return
+    with f:
+        end = f.seek(0, os.SEEK_END)
+        if end == 0:
+            return
+        f.seek(end - 1)
+        if f.read(1) == b'\n':
+            return
+        # Read back to the last newline
+        start = end
+        tail = b''
+        while start > 0:
+            size = min(4096, start)
+            start -= size
+            f.seek(start)
+            chunk = f.read(size)
+            i = chunk.rfind(b'\n')
+            if i >= 0:
+                start += i + 1
+                tail = chunk[i + 1:] + tail
+                break
+            tail = chunk + tail
+        try:
+            json.loads(tail.decode())
+        except ValueError:
+            f.truncate(start)
+        else:
+            f.seek(end)
+            f.write(b'\n')
+
+
+class UserStore:
+    # A directory of users, each stored as a small header that is rewritten on save and two logs that are only
+    # ever appended to: games played (history) and logins per address. An index maps user ids to names.
+    #
+    # Every record is one line of JSON. A crash can cut a log's last line short: reading skips it, and the next
+    # append finishes or removes it first. A damaged line anywhere else is an error.
+    def __init__(self, directory):
+        self.directory = directory
+        # The index, read the first time it's needed and kept up to date as it's appended to
+        self._users = None
+        # Logs whose ends have been checked since this store was made; only a crash while appending tears one
+        self._repaired = set()
+
+    def _path(self, id_, kind):
+        return os.path.join(self.directory, '{}.{}'.format(id_, kind))
+
+    def _append(self, path, record):
+        os.makedirs(self.directory, exist_ok=True)
+        if path not in self._repaired:
+            _repair(path)
+            self._repaired.add(path)
+        with open(path, 'a') as f:
+            f.write(json.dumps(record, separators=(',', ':')) + '\n')
+
+    def _read(self, path):
+        try:
+            with open(path) as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return []
+        records = []
+        for i, line in enumerate(lines):
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                if line.endswith('\n'):
+                    raise ValueError('Damaged record on line {} of {}'.format(i + 1, path))
+        return records
+
+    def users(self):
+        # id -> name; later records win, so a rename is just another record
+        if self._users is None:
+            self._users = {id_: name for id_, name in self._read(os.path.join(self.directory, INDEX))}
+        return self._users
+
+    def next_id(self):
+        return max(self.users(), default=0) + 1
+
+    def exists(self, id_):
+        return os.path.exists(self._path(id_, 'header'))
+
+    def load_header(self, id_):
+        with open(self._path(id_, 'header')) as f:
+            header = json.load(f)
+        if header.get('format') != FORMAT:
+            raise ValueError('User {} is stored in format {}, not {}'.format(id_, header.get('format'), FORMAT))
+        return header
+
+    def save_header(self, header):
+        os.makedirs(self.directory, exist_ok=True)
+        id_ = header['id']
+        path = self._path(id_, 'header')
+        with open(path + '.tmp', 'w') as f:
+            json.dump(dict(header, format=FORMAT), f)
+        os.replace(path + '.tmp', path)
+        # Only a new user or a rename adds to the index
+        users = self.users()
+        if users.get(id_) != header['name']:
+            self._append(os.path.join(self.directory, INDEX), [id_, header['name']])
+            users[id_] = header['name']
+
+    def append_history(self, id_, record):
+        self._append(self._path(id_, 'history'), record)
+
+    def read_history(self, id_):
+        return self._read(self._path(id_, 'history'))
+
+    def append_address(self, id_, address, num_logins, first_login, last_login):
+        self._append(self._path(id_, 'addresses'), [address, num_logins, first_login, last_login])
+
+    def read_addresses(self, id_):
+        return self._read(self._path(id_, 'addresses'))
+
+    def migrate_pickles(self, to_header, to_history=lambda record: record):
+        # Imports users saved by the old pickle-based save_user_data: files named by user id. Each imported
+        # pickle is renamed to <id>.pickle so it is only imported once; until then, importing it again starts over.
+        migrated = []
+        for filename in sorted(os.listdir(self.directory)):
+            if not filename.isdigit():
+                continue
+            path = os.path.join(self.directory, filename)
+            with open(path, 'rb') as f:
+                old = vars(pickle.load(f))
+            id_ = int(filename)
+            header = to_header(old)
+            header['id'] = id_
+            for kind in ('history', 'addresses'):
+                if os.path.exists(self._path(id_, kind)):
+                    os.remove(self._path(id_, kind))
+            address_info = old.get('address_info') or {}
+            for info in (address_info.values() if isinstance(address_info, dict) else address_info):
+                self.append_address(id_, info.address, info.num_logins, info.first_login, info.last_login)
+            for record in old.get('history') or []:
+                self.append_history(id_, to_history(record))
+            self.save_header(header)
+            os.replace(path, path + '.pickle')
+            migrated.append(id_)
+        return migrated
@@ -23,6 +23,7 @@ setup(
         download_url='https://www.github.com/BenFrankel/Set-MP/tarball/' + version,
 
         packages=find_packages(),
+        python_requires='>=3.7',
         install_requires=[
             'hgf (==0.2.0)',
         ],